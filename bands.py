@@ -3,34 +3,96 @@ from constants import QA_STRING
 from constants import MTL_STRING
 from identifiers import LANDSAT_BANDS
 from identifiers import LANDSAT_IDENTIFIERS
+from identifiers import BAND_RE
+from identifiers import COLLECTION_2_QA_BAND
 from messages import MESSAGE_UNKNOWN_LANDSAT_IDENTIFIER
 import os
-import glob
 import re
+from collections import namedtuple
 import grass.script as grass
 from identify import identify_product_collection
+from metadata import get_path_to_mapset
 
+# inventory of existing raster maps per Mapset, see list_existing_bands()
+EXISTING_BANDS = {}
+CELLHD = 'cellhd'
 
-def find_existing_band(band):
+# a band file of a Landsat scene, see classify_band_filenames()
+BandFile = namedtuple('BandFile', ['band', 'filename', 'path', 'collection'])
+
+# one precompiled pattern per collection, capturing any band token
+BAND_PATTERNS = {
+        collection: re.compile(template.format(band_pattern=BAND_RE) + '$')
+        for collection, template in LANDSAT_IDENTIFIERS['band_template'].items()
+}
+
+
+def list_existing_bands(mapset):
     """
-    Check if band exists in the current mapset
+    Return the set of raster maps that exist in the requested Mapset
 
-    Parameter "element": 'raster', 'raster_3d', 'vector'
+    The inventory is read once per Mapset, by listing the 'cellhd' element
+    directory which holds the header of every native or linked raster map,
+    and is then kept in memory. Imported bands are added to it via
+    register_band().
     """
-    result = grass.find_file(name=band, element='cell', mapset='.')
-    if result['file']:
-        # grass.verbose(_("Band {band} exists".format(band=band)))
-        return True
-    else:
-        return False
+    if mapset not in EXISTING_BANDS:
+        path_to_cellhd = '/'.join([get_path_to_mapset(mapset), CELLHD])
+        try:
+            EXISTING_BANDS[mapset] = set(os.listdir(path_to_cellhd))
+
+        except OSError:
+            EXISTING_BANDS[mapset] = set()
 
-def match_band_filenames(bands, scene):
+    return EXISTING_BANDS[mapset]
+
+def register_band(band, mapset):
     """
-    Retrieve filenames of user requested bands from a Landsat scene
+    Add an imported band in the inventory of existing raster maps
+    """
+    list_existing_bands(mapset).add(band)
+
+def find_existing_band(band, mapset):
+    """
+    Check if band exists in the requested Mapset, using the inventory of
+    existing raster maps, see list_existing_bands()
+    """
+    return band in list_existing_bands(mapset)
 
-    To Do
-    -----
-    Fix: requires a fix for 'tar.gz' files, i.e. if 'scene' = '*.tar.gz'!
+def classify_band_filenames(filenames, collection):
+    """
+    Parse each filename once against the precompiled band pattern of the
+    requested collection
+
+    Parameters
+    ----------
+    filenames :
+        Filenames or paths to classify
+
+    collection :
+        Product collection, i.e. as returned by identify_product_collection()
+
+    Returns
+    -------
+    band_files :
+        Dictionary of BandFile records keyed by band token, i.e. '1', '10'
+        or 'QA'. Filenames that are not band files are left out.
+    """
+    pattern = BAND_PATTERNS[collection]
+    band_files = dict()
+    for path in filenames:
+        filename = os.path.basename(path)
+        match = pattern.match(filename)
+        if not match:
+            continue
+        band = match.group('band')
+        band = QA_STRING if band == COLLECTION_2_QA_BAND else band[1:]
+        band_files[band] = BandFile(band, filename, path, collection)
+    return band_files
+
+def match_band_filenames(bands, scene, filenames=None):
+    """
+    Retrieve filenames of user requested bands from a Landsat scene
 
     Parameters
     ----------
@@ -40,42 +102,37 @@ def match_band_filenames(bands, scene):
     scene :
         Landsat scene directory
 
+    filenames :
+        Filenames to match against, i.e. the members of a tar.gz file. If
+        None, the files inside the scene directory are listed.
+
     Returns
     -------
-        Returns list of filenames of user requested bands
+        Returns list of BandFile records of user requested bands, sorted by
+        band number
 
     Example
     -------
         ...
     """
     product_collection = identify_product_collection(os.path.basename(scene))
-    try:
-        regular_expression_template = LANDSAT_IDENTIFIERS['band_template'][product_collection]
-    except:
+    if product_collection not in BAND_PATTERNS:
         grass.fatal(_(MESSAGE_UNKNOWN_LANDSAT_IDENTIFIER.format(scene=scene)))
 
-    band_template = identify_product_collection(os.path.basename(scene))
-    requested_filenames = []
+    if filenames is None:
+        filenames = [os.path.join(scene, filename) for filename in os.listdir(scene)]
+    band_files = classify_band_filenames(filenames, product_collection)
+    requested_band_files = set()
     for band in bands:
-        for filename in os.listdir(scene):
-            template = regular_expression_template.format(band_pattern=band)
-            pattern = re.compile(template)
-            if pattern.match(filename):
-                absolute_filename = scene + '/' + filename
-                requested_filename = os.path.basename(glob.glob(absolute_filename)[0])
-                requested_filenames.append(requested_filename)
-    # print "Requested bands:"
-    # print('\n'.join(map(str, requested_bands)))
-    return sort_band_filenames(requested_filenames)
+        if str(band) in band_files:
+            requested_band_files.add(band_files[str(band)])
+    return sort_band_files(requested_band_files)
 
-def retrieve_band_filenames(
-        bands,
-        spectral_sets,
-        scene,
-    ):
+def list_requested_bands(bands, spectral_sets, scene):
     """
+    Merge user requested bands and the bands of user requested spectral sets
     """
-    # This will fail if the 'scene=' is a compressed one, i.e. tar.gz # FIXME
+    bands = list(bands)
     if bands == [''] and spectral_sets == ['']:
         spectral_sets = ['all']
 
@@ -85,10 +142,23 @@ def retrieve_band_filenames(
                         scene,
                     )
         bands.extend(band_subset)
+    return bands
 
+def retrieve_band_filenames(
+        bands,
+        spectral_sets,
+        scene,
+        filenames=None,
+    ):
+    """
+    Retrieve filenames of user requested bands and spectral sets. See
+    match_band_filenames() for the 'filenames' parameter.
+    """
+    bands = list_requested_bands(bands, spectral_sets, scene)
     band_filenames = match_band_filenames(
                 bands=bands,
                 scene=scene,
+                filenames=filenames,
             )
     return band_filenames
 
@@ -101,18 +171,26 @@ def list_band_sets(spectral_sets, scene):
         requested_bands.extend(bands)
     return list(set(requested_bands))
 
-def sort_band_filenames(band_filenames):
+def sort_band_files(band_files):
     """
+    Sort BandFile records by band number, non-numeric bands last
     """
-    filenames = sorted(band_filenames, key=lambda item:
-            (int(item.partition('_B')[2].partition('.')[0])
-                if item.partition('_B')[2].partition('.')[0].isdigit()
-                else float('inf'), item))
-    return filenames
+    return sorted(band_files, key=lambda item:
+            (int(item.band) if item.band.isdigit() else float('inf'),
+                item.filename))
 
 def get_name_band(scene, filename, single_mapset=False):
     """
+    Return the raster map name and the band of a band file, given either as
+    a BandFile record or as a filename
     """
+    if isinstance(filename, BandFile):
+        name = 'B' + filename.band
+        band = int(filename.band) if filename.band.isdigit() else name
+        if single_mapset:
+            name = os.path.basename(scene) + '_' + name
+        return name, band
+
     absolute_filename = os.path.join(scene, filename)
 
     # detect image quality strings in filenames
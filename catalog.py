@@ -0,0 +1,277 @@
+import os
+import glob
+import json
+import sqlite3
+import time
+import grass.script as grass
+from grass.pygrass.modules.shortcuts import general as g
+from constants import DATE_STRINGS
+from constants import TIME_STRINGS
+from constants import CLOUD_COVER_STRINGS
+from identify import parse_product_identifier
+from bands import classify_band_filenames
+from bands import sort_band_files
+from metadata import read_mtl
+from metadata import find_mtl_value
+from tar import is_tar
+from tar import get_scene_directory
+from tar import list_tar_members
+from tar import read_mtl_from_tar
+from timestamp import build_tgis_timestamp
+from timestamp import get_timestamp_from_mtl
+from timestamp import get_timestamp_from_identifier
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    path TEXT PRIMARY KEY,
+    scene TEXT NOT NULL,
+    collection TEXT,
+    sensor TEXT,
+    satellite TEXT,
+    wrs_path TEXT,
+    wrs_row TEXT,
+    acquisition_date TEXT,
+    category TEXT,
+    size INTEGER,
+    mtime REAL,
+    bands TEXT,
+    mtl TEXT
+);
+CREATE TABLE IF NOT EXISTS imports (
+    scene TEXT NOT NULL,
+    mapset TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated REAL,
+    PRIMARY KEY (scene, mapset)
+);
+"""
+IMPORTED = 'imported'
+FAILED = 'failed'
+
+
+def open_catalog(filename):
+    """
+    Open, or create, a scene catalog, a SQLite data base that records, for
+    each scene of a pool, its identifier fields, size, modification time,
+    band files, timestamp (and more) from its MTL file and its import status
+    per target Mapset
+    """
+    connection = sqlite3.connect(filename)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(CATALOG_SCHEMA)
+    return connection
+
+def catalog_entry(path, status):
+    """
+    Build a catalog record of a Landsat scene directory or (compressed) tar
+    file. Band files and MTL fields are read from the scene directory or
+    from the tar file's member index and MTL member, without extracting it.
+    """
+    scene = get_scene_directory(path)
+    product_identifier = parse_product_identifier(scene)
+    entry = {
+            'path': path,
+            'scene': scene,
+            'size': status.st_size,
+            'mtime': status.st_mtime,
+            'bands': None,
+            'mtl': None,
+    }
+    for field in ('collection', 'sensor', 'satellite', 'category'):
+        entry[field] = getattr(product_identifier, field, None)
+    entry['wrs_path'] = getattr(product_identifier, 'path', None)
+    entry['wrs_row'] = getattr(product_identifier, 'row', None)
+    entry['acquisition_date'] = None
+    if product_identifier:
+        entry['acquisition_date'] = product_identifier.acquisition_date.isoformat()
+
+    if not product_identifier:
+        return entry
+
+    mtl = None
+    if is_tar(path):
+        # the index is written while reading the MTL, in a single pass
+        mtl = read_mtl_from_tar(path, build_index=True)
+        filenames = list_tar_members(path)
+
+    elif os.path.isdir(path):
+        filenames = os.listdir(path)
+        if glob.glob(path + '/*MTL.txt'):
+            mtl = read_mtl(path)
+
+    else:
+        return entry
+
+    band_files = classify_band_filenames(filenames, product_identifier.collection)
+    entry['bands'] = json.dumps(
+            [band_file.filename for band_file in sort_band_files(band_files.values())]
+    )
+    if mtl:
+        fields = dict()
+        for key in DATE_STRINGS + TIME_STRINGS + CLOUD_COVER_STRINGS:
+            value = find_mtl_value(mtl, [key])
+            if value is not None:
+                fields[key] = value
+        entry['mtl'] = json.dumps(fields)
+    return entry
+
+def refresh_catalog(connection, paths):
+    """
+    Bring the catalog up to date with the given scene paths. Only new
+    scenes and scenes whose size or modification time changed are read.
+    Scenes no longer present are removed.
+    """
+    known = {
+            row['path']: (row['size'], row['mtime'])
+            for row in connection.execute('SELECT path, size, mtime FROM scenes')
+    }
+    refreshed = 0
+    with connection:
+        for path in paths:
+            status = os.stat(path)
+            if known.pop(path, None) == (status.st_size, status.st_mtime):
+                continue
+            entry = catalog_entry(path, status)
+            connection.execute(
+                    'INSERT OR REPLACE INTO scenes ({fields}) VALUES ({values})'.format(
+                        fields=', '.join(entry),
+                        values=', '.join(':' + field for field in entry),
+                    ),
+                    entry,
+            )
+            refreshed += 1
+
+        connection.executemany(
+                'DELETE FROM scenes WHERE path = ?',
+                [(path,) for path in known],
+        )
+    message = f'Catalog: {refreshed} scene(s) refreshed, {len(known)} removed'
+    grass.verbose(message)
+
+def count_catalog_scenes(connection, select=None):
+    """
+    Count the scenes in the catalog, optionally only those whose path passes
+    the 'select' function
+    """
+    if not select:
+        return connection.execute('SELECT COUNT(*) FROM scenes').fetchone()[0]
+
+    rows = connection.execute('SELECT path FROM scenes')
+    return sum(1 for row in rows if select(row['path']))
+
+def list_catalog_bands(connection, select=None):
+    """
+    List the band files of each scene in the catalog, see count_catalog_scenes()
+    for the 'select' function
+    """
+    rows = connection.execute('SELECT path, scene, bands FROM scenes ORDER BY path')
+    for row in rows:
+        if select and not select(row['path']):
+            continue
+        bands = json.loads(row['bands']) if row['bands'] else []
+        message = f'List of files in {row["scene"]}\n'
+        message += '\n'.join(bands)
+        g.message(message)
+
+def list_catalog_timestamps(
+        connection,
+        prefix,
+        metadata_source='mtl',
+        skip_microseconds=False,
+        select=None,
+    ):
+    """
+    Build t.register compliant timestamps of the scenes in the catalog, from
+    the recorded MTL fields, else, or if metadata_source is 'filename', from
+    the product identifier. See count_catalog_scenes() for the 'select'
+    function.
+    """
+    timestamps = []
+    rows = connection.execute(
+            'SELECT path, scene, mtl FROM scenes'
+            ' WHERE acquisition_date IS NOT NULL ORDER BY path'
+    )
+    for row in rows:
+        if select and not select(row['path']):
+            continue
+        if row['mtl'] and metadata_source != 'filename':
+            timestamp = get_timestamp_from_mtl(
+                    json.loads(row['mtl']),
+                    skip_microseconds=skip_microseconds,
+            )
+        else:
+            timestamp = get_timestamp_from_identifier(row['path'])
+        timestamps.append(
+                build_tgis_timestamp(
+                    prefix=prefix,
+                    scene=row['scene'],
+                    timestamp=timestamp,
+                )
+        )
+    return timestamps
+
+def find_catalog_cloud_cover(connection, path):
+    """
+    Return the cloud cover, in percent, recorded in the catalog for a scene,
+    or None if it is unknown, see read_cloud_cover()
+    """
+    row = connection.execute(
+            'SELECT mtl FROM scenes WHERE path = ?',
+            (path,),
+    ).fetchone()
+    if not row or not row['mtl']:
+        return None
+
+    fields = json.loads(row['mtl'])
+    for key in CLOUD_COVER_STRINGS:
+        if key in fields:
+            cloud_cover = float(fields[key])
+            return cloud_cover if cloud_cover >= 0 else None
+
+def get_target_mapset(landsat_scene, mapset, single_mapset=False):
+    """
+    Return the Mapset a scene is imported in
+    """
+    if single_mapset:
+        return mapset
+    return get_scene_directory(landsat_scene)
+
+def select_scenes_to_import(connection, landsat_scenes, mapset, single_mapset=False):
+    """
+    Leave out scenes recorded as imported in their target Mapset
+    """
+    selected_scenes = []
+    skipped = 0
+    for landsat_scene in landsat_scenes:
+        if is_imported(
+                connection,
+                get_scene_directory(landsat_scene),
+                get_target_mapset(landsat_scene, mapset, single_mapset),
+        ):
+            skipped += 1
+            continue
+        selected_scenes.append(landsat_scene)
+
+    if skipped:
+        g.message(f'Catalog: skipping {skipped} already imported scene(s)')
+    return selected_scenes
+
+def is_imported(connection, scene, mapset):
+    """
+    Check if a scene is recorded as imported in the requested Mapset
+    """
+    row = connection.execute(
+            'SELECT status FROM imports WHERE scene = ? AND mapset = ?',
+            (scene, mapset),
+    ).fetchone()
+    return bool(row) and row['status'] == IMPORTED
+
+def record_import(connection, scene, mapset, status=IMPORTED):
+    """
+    Record the import status of a scene in the requested Mapset
+    """
+    with connection:
+        connection.execute(
+                'INSERT OR REPLACE INTO imports VALUES (?, ?, ?, ?)',
+                (scene, mapset, status, time.time()),
+        )
@@ -0,0 +1,127 @@
+import os
+import grass.script as grass
+from tar import VSITAR
+
+# the GDAL Python bindings are required to convert bands and build overviews only
+try:
+    from osgeo import gdal
+
+except ImportError:
+    gdal = None
+
+COG_DRIVER = 'COG'
+COG_CREATION_OPTIONS = [
+        'COMPRESS=DEFLATE',
+        'PREDICTOR=YES',
+        'BLOCKSIZE=512',
+        'OVERVIEWS=AUTO',
+        'BIGTIFF=IF_SAFER',
+]
+PARTIAL_EXTENSION = '.part'
+OVERVIEW_RESAMPLING = 'AVERAGE'
+
+
+def require_gdal():
+    """
+    Fail if the GDAL Python bindings are missing
+    """
+    if gdal is None:
+        grass.fatal(_('Building overviews requires the GDAL Python bindings'))
+
+def require_cog_driver():
+    """
+    Fail if the GDAL Python bindings or GDAL's COG driver (GDAL >= 3.1) are
+    missing
+    """
+    if gdal is None or gdal.GetDriverByName(COG_DRIVER) is None:
+        message = 'Converting bands to Cloud Optimized GeoTIFFs requires'
+        message += ' the GDAL Python bindings and GDAL >= 3.1'
+        grass.fatal(_(message))
+
+def get_cog_filename(cog_directory, scene, filename):
+    """
+    Return the path to the Cloud Optimized GeoTIFF of a band file inside the
+    cache directory, in a sub-directory named after the scene
+    """
+    return os.path.join(cog_directory, scene, filename)
+
+def convert_to_cog(filename, cog_filename, reference):
+    """
+    Convert a band file into a tiled, compressed Cloud Optimized GeoTIFF with
+    internal overviews, unless a conversion newer than 'reference' exists
+
+    The conversion is written to a temporary file first and renamed once
+    complete, so that an interrupted conversion is never mistaken for a
+    cached one.
+
+    Parameters
+    ----------
+    filename :
+        Path to the band file, or GDAL virtual file system path
+
+    cog_filename :
+        Path to the Cloud Optimized GeoTIFF, see get_cog_filename()
+
+    reference :
+        The band file or the tar file it is read from, whose modification
+        time invalidates existing conversions
+
+    Returns
+    -------
+    error :
+        None if the conversion exists or succeeded, else an error message
+    """
+    if (
+            os.path.exists(cog_filename)
+            and os.path.getmtime(cog_filename) >= os.path.getmtime(reference)
+    ):
+        grass.verbose(f'Reusing {cog_filename}')
+        return None
+
+    os.makedirs(os.path.dirname(cog_filename), exist_ok=True)
+    partial = cog_filename + PARTIAL_EXTENSION
+    dataset = gdal.Translate(
+            partial,
+            filename,
+            format=COG_DRIVER,
+            creationOptions=COG_CREATION_OPTIONS,
+    )
+    if dataset is None:
+        return f'Unable to convert {filename}: {gdal.GetLastErrorMsg()}'
+
+    dataset = None  # flush and close
+    os.replace(partial, cog_filename)
+
+def build_overviews(filename, factors):
+    """
+    Build GDAL overviews of a linked band file, in an external '.ovr' file
+    next to it, unless it has overviews already, i.e. a Cloud Optimized
+    GeoTIFF
+
+    Parameters
+    ----------
+    filename :
+        Path to the band file
+
+    factors :
+        List of reduction factors, i.e. [2, 4, 8]
+
+    Returns
+    -------
+    error :
+        None if the overviews exist or were built, else an error message
+    """
+    if filename.startswith(VSITAR):
+        return f'Unable to write overviews of {filename} inside a tar file'
+
+    dataset = gdal.Open(filename)
+    if dataset is None:
+        return f'Unable to open {filename}: {gdal.GetLastErrorMsg()}'
+
+    if dataset.GetRasterBand(1).GetOverviewCount():
+        return None
+
+    if dataset.BuildOverviews(OVERVIEW_RESAMPLING, list(factors)) != 0:
+        return f'Unable to build overviews of {filename}: {gdal.GetLastErrorMsg()}'
+
+    dataset = None  # flush and close
@@ -4,6 +4,7 @@ MONTHS = {'01': 'jan', '02': 'feb', '03': 'mar', '04': 'apr', '05': 'may',
 
 DATE_STRINGS = ['DATE_ACQUIRED', 'ACQUISITION_DATE']
 TIME_STRINGS = ['SCENE_CENTER_TIME', 'SCENE_CENTER_SCAN_TIME']
+CLOUD_COVER_STRINGS = ['CLOUD_COVER', 'CLOUD_COVER_LAND']
 ZERO_TIMEZONE = '+0000'
 GRASS_VERBOSITY_LELVEL_3 = '3'
 IMAGE_QUALITY_STRINGS = ['QA', 'VCID']
@@ -11,3 +12,10 @@ QA_STRING = 'QA'  # Merge with above?  # FIXME
 MTL_STRING = 'MTL'
 HORIZONTAL_LINE = 79 * '-' + '\n'
 MEMORY_DEFAULT = '300'
+TAR_EXTENSIONS = ['.tar.gz', '.tgz', '.tar']
+GZIP_EXTENSIONS = ['.tar.gz', '.tgz']
+GZIP_DECOMPRESSORS = {
+        'pigz': ['pigz', '--decompress', '--stdout'],
+        'igzip': ['igzip', '--decompress', '--stdout'],
+        }
+TAR_INDEX_EXTENSION = '.index.json'
@@ -1,17 +1,198 @@
 import os
-from helpers import run
+import time
+from concurrent.futures import ThreadPoolExecutor
+from helpers import provision_mapset
+from journal import open_journal
+from journal import get_source_signature
+from journal import check_journal
+from journal import record_band
+from journal import JOURNALED
+from journal import CHANGED
+from native import R_IN_GDAL_ENGINE
+from native import NATIVE_ENGINE
+from native import NATIVE_ENGINES
+from native import STACKED_ENGINE
+from native import import_geotiff_native
+from native import import_geotiffs_stacked
+from native import switch_mapset
 from identifiers import GEOTIFF_EXTENSION
 from metadata import copy_mtl_in_cell_misc
 from timestamp import get_timestamp
-from timestamp import set_timestamp
+from timestamp import set_timestamps
 from timestamp import build_tgis_timestamp
 from timestamp import simple_timestamp
 import grass.script as grass
+from grass.exceptions import CalledModuleError
 from grass.pygrass.modules.shortcuts import general as g
 from grass.pygrass.modules.shortcuts import raster as r
+from cog import build_overviews
+from cog import convert_to_cog
+from cog import get_cog_filename
+from univariate import write_statistics
+from univariate import write_scene_statistics
+from qa import decode_qa
+from qa import get_mask_name
+from constants import QA_STRING
 from bands import get_name_band
 from bands import find_existing_band
-from bands import sort_band_filenames
+from bands import register_band
+
+
+def import_geotiff(
+        parameters,
+        link_geotiffs=False,
+        memory=None,
+        region=None,
+        engine=R_IN_GDAL_ENGINE,
+        conversion=None,
+        overviews=None,
+        statistics=None,
+    ):
+    """
+    Import or link a single GeoTIFF band via r.in.gdal or r.external, or
+    in-process, see import_geotiff_native().  The time spent on each band is
+    reported, as a means to compare import engines.
+
+    Parameters
+    ----------
+    region :
+        Optional GRASS_REGION string, see get_import_region(). Only the part
+        of the band that overlaps it is read and imported.
+
+    engine :
+        'r.in.gdal' or 'gdal', the in-process import engine. For the
+        'stacked' engine, see import_geotiffs_stacked().
+
+    conversion :
+        Optional tuple of a band file and the file whose modification time
+        invalidates its conversion, see convert_to_cog(). The band file is
+        first converted to the Cloud Optimized GeoTIFF given as 'input' in
+        the parameters, which is then linked via r.external.
+
+    overviews :
+        Optional list of reduction factors.  Linked bands get GDAL overviews,
+        see build_overviews().  Bands imported in-process get coarse
+        companion maps, see import_geotiff_native().  Bands imported via
+        r.in.gdal get none.
+
+    statistics :
+        Optional dictionary to add the univariate statistics of bands
+        imported in-process to, see import_geotiff_native()
+
+    Returns
+    -------
+    error :
+        None if the band was imported successfully, else an error message
+    """
+    start = time.perf_counter()
+    if conversion:
+        error = convert_to_cog(*conversion, parameters['input'])
+        if error:
+            return error
+
+    try:
+        if link_geotiffs:
+            # What happens with the '--overwrite' flag?
+            # Check if it can be retrieved.
+            engine = 'r.external'
+            r.external(**parameters)
+            if overviews:
+                error = build_overviews(parameters['input'], overviews)
+                if error:
+                    grass.warning(error)
+
+        elif engine == NATIVE_ENGINE:
+            error = import_geotiff_native(
+                    parameters,
+                    region=region,
+                    overviews=overviews,
+                    statistics=statistics,
+            )
+            if error:
+                return error
+
+        else:
+            if memory:
+                parameters['memory'] = memory
+            if region:
+                parameters['flags'] += 'r'
+                parameters['env_'] = dict(os.environ, GRASS_REGION=region)
+            r.in_gdal(**parameters)
+
+    except CalledModuleError as error:
+        return str(error)
+
+    seconds = time.perf_counter() - start
+    message = f'{parameters["output"]} imported via {engine} in {seconds:.2f} s'
+    grass.verbose(message)
+
+
+def decode_qa_masks(
+        scene,
+        band_filenames,
+        source,
+        mapset,
+        qa_masks,
+        cloud_threshold=None,
+        single_mapset=False,
+        skip_import=False,
+        region=None,
+    ):
+    """
+    Decode the requested masks from the quality assessment band of a scene
+    and check if the scene is too cloudy to import its spectral bands, see
+    import_geotiffs()
+
+    Returns
+    -------
+    A tuple of the names of the written masks and whether the scene is
+    cloudier than 'cloud_threshold'
+    """
+    qa_band_file = next(
+            (band_file for band_file in band_filenames if band_file.band == QA_STRING),
+            None,
+    )
+    if not qa_band_file:
+        grass.warning(f'No quality assessment band to decode masks from in {scene}')
+        return [], False
+
+    name, band = get_name_band(scene, qa_band_file, single_mapset)
+    skip = []
+    if skip_import and not grass.overwrite():
+        skip = [
+                mask for mask in qa_masks
+                if find_existing_band(get_mask_name(name, mask), mapset)
+        ]
+
+    switch_mapset(mapset)
+    masks, cloud_cover, error = decode_qa(
+            os.path.join(source or scene, qa_band_file.filename),
+            name,
+            qa_band_file.collection,
+            qa_masks,
+            region=region,
+            skip=skip,
+    )
+    if error:
+        grass.warning(f'Failed to decode {qa_band_file.filename}: {error}')
+        return masks, False
+
+    scene_name = os.path.basename(scene)
+    if cloud_cover is not None:
+        message = f'Cloud cover of {scene_name} according to its quality band:'
+        message += f' {cloud_cover:.2f}%'
+        g.message(message, flags='v')
+
+    cloudy = (
+            cloud_threshold is not None
+            and cloud_cover is not None
+            and cloud_cover > cloud_threshold
+    )
+    if cloudy:
+        message = f'Scene {scene_name} is {cloud_cover:.2f}% cloudy, more than'
+        message += f' {cloud_threshold}%. Skipping import of its spectral bands.'
+        g.message(message)
+    return masks, cloudy
 
 
 def import_geotiffs(
@@ -32,6 +213,18 @@ def import_geotiffs(
         do_not_timestamp=False,
         skip_microseconds=False,
         copy_mtl=True,
+        band_workers=1,
+        source=None,
+        journal=None,
+        archive=None,
+        region=None,
+        engine=R_IN_GDAL_ENGINE,
+        cog_directory=None,
+        overviews=None,
+        compute_statistics=False,
+        qa_masks=None,
+        cloud_threshold=None,
+        unpack_spectral_bands=None,
     ):
     """
     Imports all bands (GeoTIF format) of a Landsat scene be it Landsat 5,
@@ -45,7 +238,7 @@ def import_geotiffs(
         Input scene name string
 
     band_filenames :
-        Bands to import
+        Bands to import, as BandFile records
 
     mapset :
         Name of mapset to import to
@@ -64,10 +257,80 @@ def import_geotiffs(
 
     list_timestamps :
         Boolean True or False
+
+    band_workers :
+        Number of bands to import concurrently. Time-stamping and copying
+        the MTL file take place after all bands are imported.  Bands that
+        fail to import are reported without interrupting the import of the
+        other bands.
+
+    source :
+        Directory, or GDAL virtual file system path (i.e. /vsitar/), to read
+        the band files from. Defaults to the scene directory.
+
+    journal :
+        Import journal file, see open_journal(). Bands recorded in it as
+        imported from an unchanged source count as existing bands, without
+        looking them up in the Mapset.  Bands whose source changed since are
+        imported again, overwriting the existing raster map.  Imported bands,
+        and existing ones skipped via 'skip_import', are recorded.
+
+    archive :
+        The (compressed) tar file the scene was unpacked from, if any. Its
+        size and modification time identify the source of every band in
+        the journal.
+
+    region :
+        Optional GRASS_REGION string to crop imported bands to, see
+        import_geotiff()
+
+    engine :
+        Import engine, see import_geotiff(). The in-process 'gdal' and
+        'stacked' engines import one band, or one stack of bands, at a time,
+        regardless of 'band_workers', as the GRASS libraries are not
+        thread-safe.
+
+    cog_directory :
+        Cache directory of Cloud Optimized GeoTIFFs. If given, each band is
+        converted once into a Cloud Optimized GeoTIFF in it, see
+        convert_to_cog(), which is then linked via r.external, regardless of
+        'link_geotiffs' and 'engine'.
+
+    overviews :
+        Optional list of reduction factors, see import_geotiff()
+
+    compute_statistics :
+        Compute univariate statistics and a histogram of each band imported
+        in-process, while it is being written, and store them in a JSON file
+        inside the band's 'cell_misc' directory.  A summary of all bands is
+        stored next to the MTL file.
+
+    qa_masks :
+        Optional list of masks to decode from the quality assessment band,
+        before any other band is imported, see decode_qa()
+
+    cloud_threshold :
+        Optional maximum percentage of cloudy cells, among the cells that
+        are not fill, according to the quality assessment band.  Spectral
+        bands of cloudier scenes are not imported.
+
+    unpack_spectral_bands :
+        Optional function that unpacks the spectral bands of a scene whose
+        quality assessment band was unpacked first, see unpack_scene(), and
+        returns the band files to import.  It is called once the quality
+        band is decoded, only if the scene is not too cloudy.
+
+    Returns
+    -------
+    failed_bands :
+        List of the band files that failed to import
     """
     if not single_mapset:
         mapset = os.path.basename(scene)
 
+    if cog_directory:
+        link_geotiffs = True
+
     message = str()
     if not any(x for x in (list_bands, list_timestamps)):
         message = f'Date\t\tTime\t\tTimezone\n{simple_timestamp(timestamp)}\n\n'
@@ -77,16 +340,62 @@ def import_geotiffs(
         message += 'Band\tFilename\n'
         g.message(message, flags='v')
 
+    # create Mapset of interest, if it doesn't exist
+    if not any(x for x in (list_bands, list_timestamps)):
+        provision_mapset(mapset)
+        if engine in NATIVE_ENGINES and not link_geotiffs:
+            switch_mapset(mapset)
+            band_workers = 1
+
+    if journal:
+        open_journal(journal)
+    scene_name = os.path.basename(scene)
+    signatures = dict()
+    journal_entries = []
+    conversions = dict()
+
+    stamp = []
+    # decode the quality band before, and possibly instead of, other bands
+    if (
+            (qa_masks or cloud_threshold is not None)
+            and not any(x for x in (list_bands, list_timestamps))
+    ):
+        masks, cloudy = decode_qa_masks(
+                scene,
+                band_filenames,
+                source,
+                mapset,
+                qa_masks=qa_masks or [],
+                cloud_threshold=cloud_threshold,
+                single_mapset=single_mapset,
+                skip_import=skip_import,
+                region=region,
+        )
+        for mask_name in masks:
+            register_band(mask_name, mapset)
+            if not do_not_timestamp:
+                stamp.append(mask_name)
+
+        if cloudy:
+            band_filenames = [
+                    band_file for band_file in band_filenames
+                    if not band_file.band.isdigit()
+            ]
+        elif unpack_spectral_bands:
+            band_filenames = unpack_spectral_bands()
+
+    imports = []
     # loop over files inside a "Landsat" directory
     # sort band numerals, source: https://stackoverflow.com/a/2669523/1172302
-    for filename in band_filenames:
+    for band_file in band_filenames:
+        filename = band_file.filename
 
         # if not GeoTIFF, keep on working
         if os.path.splitext(filename)[-1] != GEOTIFF_EXTENSION:
             continue
 
         # use the full path name to the file
-        name, band = get_name_band(scene, filename, single_mapset)
+        name, band = get_name_band(scene, band_file, single_mapset)
         band_title = f'band {band}'
 
         if not list_timestamps:
@@ -98,7 +407,7 @@ def import_geotiffs(
                 message_skipping = '\t [ Exists, skipping ]'
 
         if not any(x for x in (list_bands, list_timestamps)):
-            absolute_filename = os.path.join(scene, filename)
+            absolute_filename = os.path.join(source or scene, filename)
             # sort import parameters
             parameters = dict(
                     input = absolute_filename,
@@ -110,66 +419,143 @@ def import_geotiffs(
             if override_projection:
                 parameters['flags'] += 'o'
 
-            # create Mapset of interest, if it doesn't exist
-            devnull = open(os.devnull, 'w')
-            run(
-                    'g.mapset',
-                    flags='c',
-                    mapset=mapset,
-                    stderr = devnull,
-            )
+            if cog_directory:
+                parameters['input'] = get_cog_filename(
+                        cog_directory,
+                        scene_name,
+                        filename,
+                )
+                conversions[name] = (
+                        absolute_filename,
+                        archive or os.path.join(scene, filename),
+                )
+
+            journal_status = None
+            if journal:
+                signatures[name] = get_source_signature(
+                        archive or os.path.join(scene, filename)
+                )
+                journal_status = check_journal(
+                        scene_name,
+                        name,
+                        mapset,
+                        signatures[name],
+                )
+
+            if journal_status == CHANGED:
+                # source changed since the band was imported, redo
+                parameters['overwrite'] = True
+                band_exists = False
+            else:
+                band_exists = (
+                        journal_status == JOURNALED
+                        or find_existing_band(name, mapset)
+                )
+
             if (
                     skip_import
-                    and find_existing_band(name)
+                    and band_exists
                     and not grass.overwrite()
             ):
 
                 if force_timestamp:
-                    set_timestamp(name, timestamp)
+                    stamp.append(name)
                     g.message(f'   >>> Force-stamp {timestamp} @ band {name}')
 
                 message_skipping = message + message_skipping
                 g.message(message_skipping, flags='v')
+                if journal and not journal_status:
+                    journal_entries.append(name)
                 pass
 
             else:
                 if (
                         grass.overwrite()
-                        and find_existing_band(name)
+                        and band_exists
                 ):
                     if force_timestamp:
-                        set_timestamp(name, timestamp)
+                        stamp.append(name)
                         g.message(f'   >>> Force-stamp {timestamp} @ band {name}')
 
                     message_overwriting = message + message_overwriting
                     g.message(message_overwriting, flags='v')
                     pass
 
-                if (skip_import and not find_existing_band(name)):
+                if (skip_import and not band_exists):
                     # FIXME
                     # communicate input band and source file name
                     message = f'{band}\t{filename}'
                     g.message(message, flags='v')
 
-                if link_geotiffs:
-                    # What happens with the '--overwrite' flag?
-                    # Check if it can be retrieved.
-                    r.external(**parameters)
+                imports.append((name, band, filename, parameters))
 
-                else:
-                    if memory:
-                        parameters['memory'] = memory
-                    # try:
-                    r.in_gdal(**parameters)
+        else:
+            pass
 
-                    # except CalledModuleError:
-                        # grass.fatal(_("Unable to read GDAL dataset {s}".format(s=scene)))
+    statistics = None
+    if compute_statistics and engine in NATIVE_ENGINES and not link_geotiffs:
+        statistics = dict()
 
-                if not do_not_timestamp:
-                    set_timestamp(name, timestamp)
+    if engine == STACKED_ENGINE and not link_geotiffs:
+        errors = import_geotiffs_stacked(
+                [(band, parameters) for name, band, filename, parameters in imports],
+                region=region,
+                overviews=overviews,
+                statistics=statistics,
+        )
 
-        else:
-            pass
+    else:
+        # import bands concurrently, each r.in.gdal/r.external is a subprocess
+        with ThreadPoolExecutor(max_workers=max(1, band_workers)) as executor:
+            errors = list(
+                    executor.map(
+                        lambda name, parameters: import_geotiff(
+                            parameters=parameters,
+                            link_geotiffs=link_geotiffs,
+                            memory=memory,
+                            region=region,
+                            engine=engine,
+                            conversion=conversions.get(name),
+                            overviews=overviews,
+                            statistics=statistics,
+                        ),
+                        [name for name, band, filename, parameters in imports],
+                        [parameters for name, band, filename, parameters in imports],
+                    )
+            )
+
+    # time-stamp after all bands are imported
+    failed_bands = []
+    for (name, band, filename, parameters), error in zip(imports, errors):
+        if error:
+            failed_bands.append(filename)
+            grass.warning(f'Failed to import {filename}: {error}')
+            continue
+
+        register_band(name, mapset)
+        if journal:
+            journal_entries.append(name)
+
+        if not do_not_timestamp and name not in stamp:
+            stamp.append(name)
+
+    if stamp:
+        set_timestamps(stamp, timestamp, mapset)
+
+    if statistics:
+        for name, summary in statistics.items():
+            write_statistics(name, mapset, summary)
+        filename = write_scene_statistics(scene_name, mapset, statistics)
+        g.message(f'Band statistics written in {filename}', flags='v')
+
+    # journal bands once time-stamped
+    for name in journal_entries:
+        record_band(scene_name, name, mapset, signatures[name], timestamp)
+
+    if failed_bands:
+        message = f'Failed to import {len(failed_bands)} band(s) of scene {scene}: '
+        message += ', '.join(failed_bands)
+        grass.warning(message)
 
     # copy MTL
     if not list_bands and not list_timestamps:
@@ -180,3 +566,5 @@ def import_geotiffs(
                 single_mapset,
                 copy_mtl
         )
+
+    return failed_bands
@@ -1,7 +1,53 @@
+import os
 import grass.script as grass
 
+# the Mapset this process switched to last, see provision_mapset()
+PROVISIONED_MAPSET = {'name': None}
+
+
 def run(cmd, **kwargs):
     """
     Pass quiet flag to grass commands
     """
     grass.run_command(cmd, quiet=True, **kwargs)
+
+def provision_mapset(mapset):
+    """
+    Create the requested Mapset, if it doesn't exist, and switch to it
+
+    'g.mapset' is run only if the requested Mapset differs from the one
+    provisioned last. Hence, importing many scenes in a single Mapset
+    creates and switches to it only once.
+    """
+    if PROVISIONED_MAPSET['name'] == mapset:
+        return
+
+    with open(os.devnull, 'w') as devnull:
+        run(
+                'g.mapset',
+                flags='c',
+                mapset=mapset,
+                stderr=devnull,
+        )
+    PROVISIONED_MAPSET['name'] = mapset
+
+def get_import_region(bbox=None):
+    """
+    Return the current computational region, or the requested bounding box,
+    as a GRASS_REGION string.  Only its extent is used: bands are cropped to
+    it on their own grid, without resampling.
+
+    Bands are imported in the Mapset of each scene, whose region differs
+    from the current one.  Hence, the region is read once, before switching
+    to any other Mapset, and passed to each import via GRASS_REGION.
+
+    Parameters
+    ----------
+    bbox :
+        Optional list of north, south, east and west coordinates
+    """
+    if bbox:
+        north, south, east, west = bbox
+        return grass.region_env(n=north, s=south, e=east, w=west)
+
+    return grass.region_env()
@@ -18,7 +18,7 @@
 """
 
 #%module
-#% description: Imports Landsat scenes (from compressed tar.gz files or unpacked directories)
+#% description: Imports Landsat scenes (from compressed tar.gz or tar files or unpacked directories)
 #% keywords: imagery
 #% keywords: landsat
 #% keywords: import
@@ -64,11 +64,22 @@
 #%  guisection: Input
 #%end
 
+#%flag
+#%  key: v
+#%  description: Read bands directly from tar.gz files via GDAL's /vsitar/, without extracting them
+#%  guisection: Input
+#%end
+
 #%flag
 #%  key: s
 #%  description: Skip import of existing band(s)
 #%end
 
+#%flag
+#%  key: u
+#%  description: Compute univariate statistics and histograms of bands while importing them via the gdal or stacked engine
+#%end
+
 #%rules
 # %  excludes: -s, --o
 #% excludes: -l, -s
@@ -106,7 +117,7 @@
 #% key: scene
 #% key_desc: id
 #% label: One or multiple Landsat scenes
-#% description: Compressed tar.gz files or decompressed and unpacked directories
+#% description: Compressed tar.gz or tar files or decompressed and unpacked directories
 #% multiple: yes
 #% required: no
 #%end
@@ -129,6 +140,106 @@
 #% requires_all: -n, pool
 #%end
 
+#%flag
+#%  key: p
+#%  description: Search the pool's sub-directories for scenes too
+#%  guisection: Filter
+#%end
+
+#%option
+#% key: wrs
+#% key_desc: path/row
+#% type: string
+#% label: WRS path/row of the pool scenes to select
+#% description: A path alone, i.e. 192, selects all of its rows
+#% multiple: yes
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: start_date
+#% key_desc: yyyy-mm-dd
+#% type: string
+#% label: First date of acquisition of the pool scenes to select
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: end_date
+#% key_desc: yyyy-mm-dd
+#% type: string
+#% label: Last date of acquisition of the pool scenes to select
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: sensor
+#% type: string
+#% label: Sensor of the pool scenes to select
+#% descriptions: C;OLI/TIRS;O;OLI;T;TIRS or TM (Pre-Collection);E;ETM+;M;TM;S;MSS
+#% options: C, O, T, E, M, S
+#% multiple: yes
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: tier
+#% type: string
+#% label: Collection category of the pool scenes to select
+#% descriptions: RT;Real-Time;T1;Tier 1;T2;Tier 2
+#% options: RT, T1, T2
+#% multiple: yes
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: collection
+#% type: string
+#% label: Collection of the pool scenes to select
+#% descriptions: pre;Pre-Collection;1;Collection 1;2;Collection 2
+#% options: pre, 1, 2
+#% multiple: yes
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: max_cloud_cover
+#% type: double
+#% label: Maximum cloud cover (%) of scenes to import
+#% description: Read from the MTL file, before any scene is extracted or imported
+#% options: 0-100
+#% required: no
+#% guisection: Filter
+#%end
+
+#%option
+#% key: catalog
+#% key_desc: filename
+#% type: string
+#% label: SQLite catalog of the scenes in pool
+#% description: Created if missing and refreshed from file sizes and modification times. Lists, counts and import selection are then read from the catalog
+#% required: no
+#%end
+
+#%rules
+#% requires: catalog, pool
+#%end
+
+#%option
+#% key: journal
+#% key_desc: filename
+#% type: string
+#% label: Import journal to resume interrupted imports from
+#% description: Imported bands are appended to it. Along with -s, journaled bands and scenes are skipped without scanning Mapsets or unpacking scenes
+#% required: no
+#%end
+
 #%option
 #% key: bands
 #% type: string
@@ -187,6 +298,17 @@
 ##%  requires_all: tgis_output, -t
 #%end
 
+#%option
+#% key: metadata_source
+#% type: string
+#% label: Source of the timestamp of each scene
+#% description: Reading from file names requires no I/O and yields the date of acquisition only
+#% descriptions: mtl;Date, time and timezone from the MTL metadata file;filename;Date from the product identifier of the scene's directory or file name;auto;MTL metadata file if the scene is an unpacked directory, else the file name
+#% options: mtl, filename, auto
+#% answer: mtl
+#% required: no
+#%end
+
 #%option
 #% key: prefix
 #% key_desc: prefix string
@@ -208,6 +330,114 @@
 #%  answer: 300
 #%end
 
+#%option
+#% key: extent
+#% type: string
+#% label: Output raster map extent
+#% description: Cropping to the region reads and writes only the part of each band that overlaps it
+#% descriptions: input;Extent of each band;region;Current computational region or bbox
+#% options: input, region
+#% answer: input
+#% required: no
+#%end
+
+#%option
+#% key: bbox
+#% key_desc: n,s,e,w
+#% type: double
+#% label: Bounding box to crop bands to, snapped to the grid of each band
+#% description: Implies extent=region
+#% multiple: yes
+#% required: no
+#%end
+
+#%option
+#% key: engine
+#% type: string
+#% label: Import engine
+#% description: Time spent on each band is reported in verbose mode
+#% descriptions: r.in.gdal;One r.in.gdal process per band;gdal;In-process, via the GDAL Python bindings, NumPy and pygrass, one band at a time;stacked;In-process, reading all bands on the same grid in one pass. Panchromatic and quality bands are imported on their own
+#% options: r.in.gdal, gdal, stacked
+#% answer: r.in.gdal
+#% required: no
+#%end
+
+#%option
+#% key: cog_directory
+#% key_desc: directory
+#% type: string
+#% label: Cache directory of Cloud Optimized GeoTIFFs to link bands to
+#% description: Each band is converted once into a tiled, compressed Cloud Optimized GeoTIFF with internal overviews, and linked via r.external
+#% required: no
+#%end
+
+#%option
+#% key: overviews
+#% key_desc: factor
+#% type: integer
+#% label: Reduction factors of overviews to build, i.e. 2,4,8,16
+#% description: Linked bands get GDAL overviews. Bands imported via the gdal or stacked engine get coarse companion maps named <band>_ov<factor>
+#% multiple: yes
+#% required: no
+#%end
+
+#%option
+#% key: qa_masks
+#% type: string
+#% label: Masks to decode from the quality assessment band
+#% description: Written as CELL raster maps of 0 and 1, named <QA band>_<mask>, before any other band is imported
+#% options: cirrus, cloud, cloud_shadow, dilated_cloud, fill, snow, water
+#% multiple: yes
+#% required: no
+#%end
+
+#%option
+#% key: cloud_threshold
+#% type: double
+#% label: Maximum cloud cover (%) according to the quality assessment band
+#% description: Spectral bands of cloudier scenes are not imported
+#% options: 0-100
+#% required: no
+#%end
+
+#%option G_OPT_M_NPROCS
+#% label: Number of scenes to import in parallel
+#% description: Each scene is imported by its own worker process
+#%end
+
+#%option
+#%  key: prefetch
+#%  key_desc: number
+#%  label: Number of tar.gz scenes to unpack ahead while importing the current one
+#%  description: Unpacking takes place in background threads
+#%  type: integer
+#%  multiple: no
+#%  required: no
+#%  answer: 0
+#%end
+
+#%option
+#%  key: reserve
+#%  key_desc: MB
+#%  label: Disk space (in MB) to keep free when unpacking scenes ahead
+#%  description: Upcoming scenes are not unpacked if less free space would remain
+#%  type: integer
+#%  multiple: no
+#%  required: no
+#%  answer: 1024
+#%end
+
+#%option
+#%  key: band_workers
+#%  key_desc: number
+#%  label: Number of bands of a scene to import concurrently
+#%  description: Each band is imported by its own r.in.gdal or r.external process
+#%  type: integer
+#%  multiple: no
+#%  required: no
+#%  answer: 1
+#%end
+
 # required librairies
 import os
 import sys
@@ -219,7 +449,6 @@ sys.path.insert(
         )
 )
 
-import shutil
 import glob
 import re
 # import shlex
@@ -231,15 +460,41 @@ from grass.pygrass.modules.shortcuts import general as g
 from grass.pygrass.modules.shortcuts import raster as r
 from constants import HORIZONTAL_LINE
 from constants import MEMORY_DEFAULT
+from constants import QA_STRING
 from messages import MESSAGE_LIST_TIMESTAMPS_HEADLINE
 from metadata import is_mtl_in_cell_misc
-from metadata import copy_mtl_in_cell_misc
-from timestamp import build_tgis_timestamp
-from timestamp import get_timestamp
-from bands import retrieve_band_filenames
+from tar import is_tar
 from tar import list_files_in_tar
-from tar import extract_tgz
-from geotiff import import_geotiffs
+from scenes import import_scene
+from helpers import get_import_region
+from native import NATIVE_ENGINES
+from cog import require_cog_driver
+from cog import require_gdal
+from native import require_native_engine
+from scenes import unpack_pending_scene
+from prefetch import prefetch_scenes
+from catalog import open_catalog
+from catalog import refresh_catalog
+from catalog import count_catalog_scenes
+from catalog import list_catalog_bands
+from catalog import list_catalog_timestamps
+from catalog import select_scenes_to_import
+from catalog import get_target_mapset
+from catalog import find_catalog_cloud_cover
+from catalog import record_import
+from catalog import IMPORTED
+from catalog import FAILED
+from tar import get_scene_directory
+from pool import POOL_COLLECTIONS
+from pool import discover_scenes
+from pool import filter_scenes
+from pool import filter_cloudy_scenes
+from pool import match_scene
+from pool import match_cloud_cover
+from pool import read_cloud_cover
+from pool import parse_date
+from pool import parse_wrs
+from parallel import import_scenes_in_parallel
 
 grass_environment = grass.gisenv()
 MAPSET = grass_environment['MAPSET']
@@ -253,12 +508,15 @@ def main():
     override_projection = flags['o']
     copy_mtl = not flags['c']
     link_geotiffs = flags['e']
+    stream_tar = flags['v']
     skip_import = flags['s']
     remove_untarred = flags['r']
     force_timestamp = flags['f']
     do_not_timestamp = flags['d']
     skip_microseconds = flags['m']
     single_mapset = flags['1']
+    recursive = flags['p']
+    compute_statistics = flags['u']
     if single_mapset:
         mapset = options['mapset']
     else:
@@ -268,93 +526,249 @@ def main():
     prefix = options['prefix']
     scene = options['scene']
     pool = options['pool']
+    catalog = options['catalog']
+    journal = options['journal']
+    scene_filters = dict(
+            wrs=parse_wrs(options['wrs'].split(',')) if options['wrs'] else None,
+            start_date=parse_date(options['start_date']),
+            end_date=parse_date(options['end_date']),
+            sensors=options['sensor'].split(',') if options['sensor'] else None,
+            tiers=options['tier'].split(',') if options['tier'] else None,
+            collections=[
+                POOL_COLLECTIONS[collection]
+                for collection in options['collection'].split(',')
+            ] if options['collection'] else None,
+    )
     bands = options['bands'].split(',')
     spectral_sets = options['set'].split(',')
     timestamp = options['timestamp']
     tgis_output = options['tgis_output']
+    metadata_source = options['metadata_source']
     memory = options['memory']
+    nprocs = int(options['nprocs'])
+    band_workers = int(options['band_workers'])
+    prefetch = int(options['prefetch'])
+    reserve = int(options['reserve'])
+    extent = options['extent']
+    engine = options['engine']
+    cog_directory = options['cog_directory']
+    overviews = options['overviews']
+    qa_masks = options['qa_masks'].split(',') if options['qa_masks'] else []
+    cloud_threshold = options['cloud_threshold']
+    bbox = options['bbox']
+    max_cloud_cover = options['max_cloud_cover']
+    max_cloud_cover = float(max_cloud_cover) if max_cloud_cover else None
     if (memory != MEMORY_DEFAULT):
         message = HORIZONTAL_LINE
         message += (f'Cache size set to {memory} MB\n')
         message += HORIZONTAL_LINE
         grass.verbose(message)
 
-    if pool:  # import all scenes from pool
-        landsat_scenes, files = [item for item in os.walk(pool)][0][1:]
-        landsat_scenes += files
+    if engine in NATIVE_ENGINES:
+        require_native_engine()
+
+    if cog_directory:
+        require_cog_driver()
+
+    if overviews:
+        overviews = sorted(set(int(factor) for factor in overviews.split(',')))
+        if any(factor < 2 for factor in overviews):
+            grass.fatal(_('Overview reduction factors must be 2 or more'))
+        if link_geotiffs:
+            require_gdal()
+        elif not cog_directory and engine not in NATIVE_ENGINES:
+            message = 'Overviews are built for linked bands and for the gdal'
+            message += ' and stacked engines only'
+            grass.warning(_(message))
+
+    cloud_threshold = float(cloud_threshold) if cloud_threshold else None
+    if qa_masks or cloud_threshold is not None:
+        require_native_engine()
+        # decoding masks requires the quality assessment band
+        if not (bands == [''] and spectral_sets == ['']) and QA_STRING not in bands:
+            bands = [band for band in bands if band] + [QA_STRING]
+
+    if compute_statistics and (
+            link_geotiffs
+            or cog_directory
+            or engine not in NATIVE_ENGINES
+    ):
+        message = 'Statistics are computed for bands imported via the gdal'
+        message += ' and stacked engines only'
+        grass.warning(_(message))
+
+    region = None
+    if extent == 'region' or bbox:
+        if bbox:
+            bbox = [float(coordinate) for coordinate in bbox.split(',')]
+            if len(bbox) != 4:
+                grass.fatal(_('The bbox option requires north, south, east and west'))
+        # read the region before switching to any scene's Mapset
+        region = get_import_region(bbox)
+        if link_geotiffs or cog_directory:
+            grass.warning(_('Linked bands are not cropped to the region'))
+
+    connection = None
+    find_cloud_cover = read_cloud_cover
+    select = lambda landsat_scene: (
+            match_scene(landsat_scene, **scene_filters)
+            and (
+                max_cloud_cover is None
+                or match_cloud_cover(landsat_scene, max_cloud_cover, find_cloud_cover)
+            )
+    )
+    if pool:  # import all scenes from pool, requires the full path to the scene
+        # scenes are yielded lazily, while the pool is being listed
+        landsat_scenes = discover_scenes(pool, recursive=recursive)
+
+        if catalog:
+            landsat_scenes = list(landsat_scenes)
+            connection = open_catalog(catalog)
+            refresh_catalog(connection, landsat_scenes)
+            find_cloud_cover = lambda landsat_scene: find_catalog_cloud_cover(
+                    connection,
+                    landsat_scene,
+            )
+
+        landsat_scenes = filter_scenes(landsat_scenes, **scene_filters)
+        if max_cloud_cover is not None:
+            landsat_scenes = filter_cloudy_scenes(
+                    landsat_scenes,
+                    max_cloud_cover,
+                    find_cloud_cover,
+            )
+
         if count_scenes:
-            count = len(landsat_scenes)
+            if connection:
+                count = count_catalog_scenes(connection, select=select)
+            else:
+                count = sum(1 for landsat_scene in landsat_scenes)
             message = f'Number of scenes in pool: {count}'
             g.message(message)
             return
 
+        if connection and list_bands:
+            list_catalog_bands(connection, select=select)
+            return
+
     if scene:  # import single or multiple given scenes
         landsat_scenes = scene.split(',')
+        if max_cloud_cover is not None:
+            landsat_scenes = list(filter_cloudy_scenes(landsat_scenes, max_cloud_cover))
+    multiple_scenes = bool(pool) or len(landsat_scenes) > 1
 
     message_list_timestamps = MESSAGE_LIST_TIMESTAMPS_HEADLINE
     timestamps = []
 
-    for landsat_scene in landsat_scenes:
-        if pool:  # requires the full path to the scene
-            landsat_scene = os.path.join(pool, landsat_scene)
-
-        if 'tar.gz' in landsat_scene:
-            if list_bands:
-                files_in_tar = list_files_in_tar(landsat_scene)
-                break  # FIXME -- Will list only first tgz file!
-
-            else:
-                extract_tgz(landsat_scene)
-                landsat_scene = landsat_scene.split('.tar.gz')[0]
-                message = f'Scene {scene} decompressed and unpacked'
-                grass.verbose(message)
-
-        timestamp = get_timestamp(
-                        scene=landsat_scene,
-                        skip_microseconds=skip_microseconds,
-                    )
-        # date_time = validate_date_time_string(date_time)
-        tgis_timestamp = build_tgis_timestamp(
-                            prefix=prefix,
-                            scene=os.path.basename(landsat_scene),
-                            timestamp=timestamp,
-                        )
-        timestamps.append(tgis_timestamp)
-
-        band_filenames = retrieve_band_filenames(
-                            bands=bands,
-                            spectral_sets=spectral_sets,
-                            scene=landsat_scene,
-                            )
-        import_geotiffs(
-                scene=landsat_scene,
-                band_filenames=band_filenames,
-                mapset=mapset,
-                memory=memory,
-                override_projection=override_projection,
+    if connection and list_timestamps:
+        timestamps = list_catalog_timestamps(
+                connection,
                 prefix=prefix,
-                link_geotiffs=link_geotiffs,
-                skip_import=skip_import,
-                single_mapset=single_mapset,
-                list_bands=list_bands,
-                list_timestamps=list_timestamps,
-                tgis_output=tgis_output,
-                timestamp=timestamp,
-                force_timestamp=force_timestamp,
-                do_not_timestamp=do_not_timestamp,
+                metadata_source=metadata_source,
                 skip_microseconds=skip_microseconds,
-                copy_mtl=copy_mtl,
+                select=select,
+        )
+        landsat_scenes = []
+
+    on_imported = None
+    if connection and not any(x for x in (list_bands, list_timestamps)):
+        if skip_import and not grass.overwrite():
+            landsat_scenes = select_scenes_to_import(
+                    connection,
+                    landsat_scenes,
+                    mapset=mapset,
+                    single_mapset=single_mapset,
+            )
+        on_imported = lambda landsat_scene, failed: record_import(
+                connection,
+                get_scene_directory(landsat_scene),
+                get_target_mapset(landsat_scene, mapset, single_mapset),
+                status=FAILED if failed else IMPORTED,
         )
 
-        if remove_untarred:
-            message = f'Removing unpacked source directory {scene}'
-            grass.verbose(message)
-            shutil.rmtree(scene)
+    import_options = dict(
+            bands=bands,
+            spectral_sets=spectral_sets,
+            mapset=mapset,
+            memory=memory,
+            override_projection=override_projection,
+            prefix=prefix,
+            link_geotiffs=link_geotiffs,
+            skip_import=skip_import,
+            remove_untarred=remove_untarred,
+            single_mapset=single_mapset,
+            list_bands=list_bands,
+            list_timestamps=list_timestamps,
+            tgis_output=tgis_output,
+            force_timestamp=force_timestamp,
+            do_not_timestamp=do_not_timestamp,
+            skip_microseconds=skip_microseconds,
+            copy_mtl=copy_mtl,
+            band_workers=band_workers,
+            stream_tar=stream_tar,
+            metadata_source=metadata_source,
+            journal=journal,
+            region=region,
+            engine=engine,
+            cog_directory=cog_directory,
+            overviews=overviews,
+            compute_statistics=compute_statistics,
+            qa_masks=qa_masks,
+            cloud_threshold=cloud_threshold,
+    )
+
+    if (
+            nprocs > 1
+            and multiple_scenes
+            and not any(x for x in (list_bands, list_timestamps))
+    ):
+        message = f'Importing scenes using {nprocs} parallel processes'
+        grass.verbose(message)
+        timestamps = import_scenes_in_parallel(
+                landsat_scenes=landsat_scenes,
+                nprocs=nprocs,
+                import_options=import_options,
+                on_imported=on_imported,
+        )
+        landsat_scenes = []
+
+    unpacked_scenes = ((landsat_scene, None) for landsat_scene in landsat_scenes)
+    if prefetch > 0 and not any(x for x in (list_bands, list_timestamps)):
+        unpacked_scenes = prefetch_scenes(
+                landsat_scenes,
+                unpack=lambda landsat_scene: unpack_pending_scene(
+                    landsat_scene,
+                    bands=bands,
+                    spectral_sets=spectral_sets,
+                    mapset=mapset,
+                    single_mapset=single_mapset,
+                    stream_tar=stream_tar,
+                    journal=journal if skip_import and not grass.overwrite() else None,
+                    quality_first=cloud_threshold is not None,
+                ),
+                depth=prefetch,
+                reserve=reserve,
+        )
+
+    for landsat_scene, unpacked in unpacked_scenes:
+
+        if is_tar(landsat_scene) and list_bands:
+            list_files_in_tar(landsat_scene)
+            continue
+
+        tgis_timestamp, failed_bands = import_scene(
+                landsat_scene,
+                unpacked=unpacked,
+                **import_options,
+        )
+        timestamps.append(tgis_timestamp)
+        if on_imported:
+            on_imported(landsat_scene, bool(failed_bands))
 
         if (
                 not list_timestamps
                 and not is_mtl_in_cell_misc(mapset)
-                and (len(landsat_scenes) > 1)
+                and multiple_scenes
         ):
             message = HORIZONTAL_LINE
             g.message(message)
@@ -36,8 +36,8 @@ SENSORS = {
         'M': 'TM',
         'S': 'MSS'
         }
-SENSOR_PRECOLLECTION_RE = '(?P<sensor>[C|E|M|S])'
-SENSOR_RE = '(?P<sensor>[C|O|T|E|S])'
+SENSOR_PRECOLLECTION_RE = '(?P<sensor>[C|O|T|E|M|S])'
+SENSOR_RE = '(?P<sensor>[C|O|T|E|M|S])'
 SENSOR = {
         'identifiers': ('C', 'T', 'E', 'M'),
         'regular_expression': {
@@ -50,23 +50,26 @@ SATELLITES = {
         '04': 'Landsat 4',
         '05': 'Landsat 5',
         '07': 'Landsat 7',
-        '08': 'Landsat 8'
+        '08': 'Landsat 8',
+        '09': 'Landsat 9'
         }
 SATELLITE_PRECOLLECTION_RE = '(?P<satellite>[14578])'
-SATELLITE_RE = '(?P<satellite>0[14578])'
+SATELLITE_RE = '(?P<satellite>0[145789])'
 PROCESSING_CORRECTION_LEVELS = {
         'L1TP': 'L1TP',
         'L1GT': 'L1GT',
-        'L1GS': 'L1GS'
+        'L1GS': 'L1GS',
+        'L2SP': 'L2SP',
+        'L2SR': 'L2SR'
         }
-PROCESSING_CORRECTION_LEVEL_RE = '(?P<processing_correction_level>(L1(?:TP|GT|GS)))'
+PROCESSING_CORRECTION_LEVEL_RE = '(?P<processing_correction_level>(L1(?:TP|GT|GS)|L2S[PR]))'
 WRS_PATH_ROW_RE = '(?P<path>[012][0-9][0-9])(?P<row>[01][0-9][0-9]|2[0-4][0-3])'
-ACQUISITION_YEAR = '(?P<acquisition_year>19|20\\d\\d)'
+ACQUISITION_YEAR = '(?P<acquisition_year>(?:19|20)\\d\\d)'
 ACQUISITION_MONTH = '(?P<acquisition_month>0[1-9]|1[012])'
 ACQUISITION_DAY = '(?P<acquisition_day>0[1-9]|[12][0-9]|3[01])'
 JULIAN_DAY = '(?P<julian_day>[0-2][0-9][0-9]|3[0-6][0-6])'
 GROUND_STATION_IDENTIFIER = '(?P<ground_station_identifier>[A-Z][A-Z][A-Z][0-9][0-9])'
-PROCESSING_YEAR = '(?P<processing_year>19|20\\d\\d)'
+PROCESSING_YEAR = '(?P<processing_year>(?:19|20)\\d\\d)'
 PROCESSING_MONTH = '(?P<processing_month>0[1-9]|1[012])'
 PROCESSING_DAY = '(?P<processing_day>0[1-9]|[12][0-9]|3[01])'
 COLLECTION_NUMBERS = {
@@ -74,6 +77,8 @@ COLLECTION_NUMBERS = {
         '02': '02'
         }
 COLLECTION_NUMBER_RE = '(?P<collection>0[12])'
+COLLECTION_1_NUMBER_RE = '(?P<collection>01)'
+COLLECTION_2_NUMBER_RE = '(?P<collection>02)'
 COLLECTION_CATEGORIES = {
         'RT': 'Real-Time',
         'T1': 'Tier 1',
@@ -141,6 +146,8 @@ LANDSAT_BANDS = {
 BAND_PRECOLLECTION_RE = '[0-9Q][01A]?'
 BAND_RE = '[0-9Q][01A]?'
 BAND_RE_TEMPLATE = '(?P<band>B{band_pattern})'
+COLLECTION_2_QA_BAND = 'QA_PIXEL'
+COLLECTION_2_BAND_RE_TEMPLATE = '(?:S[RT]_)?(?P<band>B{band_pattern}|QA_PIXEL)'
 GEOTIFF_EXTENSION = '.TIF'
 
 PRECOLLECTION_SCENE_ID = LANDSAT_PREFIX \
@@ -172,7 +179,7 @@ COLLECTION_1_SCENE_ID = LANDSAT_PREFIX \
         + PROCESSING_MONTH \
         + PROCESSING_DAY \
         + DELIMITER_RE_GROUP \
-        + COLLECTION_NUMBER_RE \
+        + COLLECTION_1_NUMBER_RE \
         + DELIMITER_RE_GROUP \
         + COLLECTION_CATEGORY_RE
 COLLECTION_1_BAND_TEMPLATE = \
@@ -181,15 +188,27 @@ COLLECTION_1_BAND_TEMPLATE = \
         + BAND_RE_TEMPLATE \
         + GEOTIFF_EXTENSION
 
+COLLECTION_2_SCENE_ID = COLLECTION_1_SCENE_ID.replace(
+        COLLECTION_1_NUMBER_RE,
+        COLLECTION_2_NUMBER_RE,
+        )
+COLLECTION_2_BAND_TEMPLATE = \
+        COLLECTION_2_SCENE_ID \
+        + DELIMITER_RE_GROUP \
+        + COLLECTION_2_BAND_RE_TEMPLATE \
+        + GEOTIFF_EXTENSION
+
 LANDSAT_IDENTIFIERS = {
         'prefix': LANDSAT_PREFIX,
         'sensor': {
             'description': 'Sensor',
             'identifiers': {
+                'Collection 2': SENSORS,
                 'Collection 1': SENSORS,
                 'Pre-Collection': SENSORS_PRECOLLECTION
                 },
             'regular_expression': {
+                'Collection 2': SENSOR_RE,
                 'Collection 1': SENSOR_RE,
                 'Pre-Collection': SENSOR_PRECOLLECTION_RE
                 }
@@ -198,6 +217,7 @@ LANDSAT_IDENTIFIERS = {
             'description': 'Satellite',
             'identifiers': SATELLITES,
             'regular_expression': {
+                'Collection 2': SATELLITE_RE,
                 'Collection 1': SATELLITE_RE,
                 'Pre-Collection': SATELLITE_PRECOLLECTION_RE
                 }
@@ -240,15 +260,19 @@ LANDSAT_IDENTIFIERS = {
             'regular_expression': COLLECTION_CATEGORY_RE
             },
         'scene_template': {
+            'Collection 2': COLLECTION_2_SCENE_ID,
             'Collection 1': COLLECTION_1_SCENE_ID,
             'Pre-Collection': PRECOLLECTION_SCENE_ID
             },
+        COLLECTION_2_SCENE_ID: 'Collection 2',
         COLLECTION_1_SCENE_ID: 'Collection 1',
         PRECOLLECTION_SCENE_ID: 'Pre-Collection',
         'band_template': {
+                'Collection 2': COLLECTION_2_BAND_TEMPLATE,
                 'Collection 1': COLLECTION_1_BAND_TEMPLATE,
                 'Pre-Collection': PRECOLLECTION_BAND_TEMPLATE
                 },
+        COLLECTION_2_BAND_TEMPLATE: 'Collection 2',
         COLLECTION_1_BAND_TEMPLATE: 'Collection 1',
         PRECOLLECTION_BAND_TEMPLATE: 'Pre-Collection'
         }
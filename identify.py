@@ -1,6 +1,82 @@
 from identifiers import LANDSAT_IDENTIFIERS
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
 import re
 
+# one precompiled pattern per collection, see parse_product_identifier()
+SCENE_PATTERNS = {
+        collection: re.compile(template)
+        for collection, template in LANDSAT_IDENTIFIERS['scene_template'].items()
+}
+
+ProductIdentifier = namedtuple(
+        'ProductIdentifier',
+        [
+            'identifier',
+            'collection',
+            'sensor',
+            'satellite',
+            'processing_correction_level',
+            'path',
+            'row',
+            'acquisition_date',
+            'category',
+            'groups',
+        ]
+)
+
+
+def build_acquisition_date(groups):
+    """
+    Build the acquisition date from the named groups of a product identifier,
+    be it year, month and day or year and julian day
+    """
+    year = groups['acquisition_year']
+    if groups.get('julian_day'):
+        return datetime.strptime(year + groups['julian_day'], '%Y%j').date()
+
+    month = groups['acquisition_month']
+    day = groups['acquisition_day']
+    return datetime.strptime(year + month + day, '%Y%m%d').date()
+
+@lru_cache(maxsize=None)
+def parse_product_identifier(scene):
+    """
+    Parse a Landsat product identifier by matching it against pre-compiled
+    regular expression patterns, one for each known collection
+
+    Parameters
+    ----------
+    scene :
+        A Landsat product identifier string
+
+    Returns
+    -------
+    product_identifier :
+        A ProductIdentifier holding the collection, the most common fields
+        and all named groups of the matching pattern, or None if the
+        identifier does not match any known pattern. Satellite numbers are
+        zero-padded to two digits across collections.
+    """
+    for collection, pattern in SCENE_PATTERNS.items():
+        match = pattern.match(scene)
+        if not match:
+            continue
+
+        groups = match.groupdict()
+        return ProductIdentifier(
+                identifier=match.group(0),
+                collection=collection,
+                sensor=groups['sensor'],
+                satellite=groups['satellite'].zfill(2),
+                processing_correction_level=groups.get('processing_correction_level'),
+                path=groups['path'],
+                row=groups['row'],
+                acquisition_date=build_acquisition_date(groups),
+                category=groups.get('category'),
+                groups=groups,
+        )
 
 def identify_product_collection(scene):
     """
@@ -13,24 +89,12 @@ def identify_product_collection(scene):
     scene :
         A Landsat product identifier string
 
-    template :
-        A list of regular expression templates against which to validate the
-        'scene' string
-
     Returns
     -------
-    ...
-
-    Raises
-    ------
-    ...
+    collection :
+        The name of the collection, i.e. 'Collection 1', or None if the
+        identifier does not match any known pattern
     """
-    for template_key in LANDSAT_IDENTIFIERS['scene_template']:
-        template = LANDSAT_IDENTIFIERS['scene_template'][template_key]
-        try:
-            # re.match(pattern, string, flags=0)
-            if re.match(template, scene):
-                return template_key
-        except:
-            g.fatal(_("No match"))
-
+    product_identifier = parse_product_identifier(scene)
+    if product_identifier:
+        return product_identifier.collection
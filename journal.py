@@ -0,0 +1,92 @@
+import os
+import json
+
+# completed imports, loaded once per journal file, see open_journal()
+JOURNAL = {'filename': None, 'entries': {}, 'scenes': set()}
+JOURNALED = 'journaled'
+CHANGED = 'changed'
+
+
+def open_journal(filename):
+    """
+    Load the import journal, an append-only file of JSON lines, each one
+    recording an imported band: the scene, the raster map name, the target
+    Mapset, the signature of the source it was imported from and the
+    timestamp of the scene.  Later lines override earlier ones for the same
+    scene, band and Mapset.
+
+    The journal is read only once per file and is then kept in memory.
+    """
+    if JOURNAL['filename'] == filename:
+        return
+
+    entries = dict()
+    if os.path.exists(filename):
+        with open(filename) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+
+                except ValueError:  # i.e. a line cut short by an interruption
+                    continue
+
+                key = (entry['scene'], entry['band'], entry['mapset'])
+                entries[key] = (entry['signature'], entry['timestamp'])
+
+    JOURNAL['filename'] = filename
+    JOURNAL['entries'] = entries
+    JOURNAL['scenes'] = set(scene for scene, band, mapset in entries)
+
+def get_source_signature(path):
+    """
+    Return the size and modification time of a band file or of the tar file
+    it is read from, as a string
+    """
+    status = os.stat(path)
+    return f'{status.st_size}:{status.st_mtime_ns}'
+
+def is_scene_journaled(scene):
+    """
+    Check if any band of a scene is recorded in the journal
+    """
+    return scene in JOURNAL['scenes']
+
+def check_journal(scene, band, mapset, signature):
+    """
+    Check if a band is recorded in the journal
+
+    Returns
+    -------
+    status :
+        JOURNALED if the band was imported from the same source, CHANGED if
+        it was imported from a source that has since changed, else None
+    """
+    entry = JOURNAL['entries'].get((scene, band, mapset))
+    if not entry:
+        return None
+
+    if entry[0] == signature:
+        return JOURNALED
+    return CHANGED
+
+def find_journaled_timestamp(scene, band, mapset):
+    """
+    Return the timestamp recorded along with a band in the journal
+    """
+    return JOURNAL['entries'][(scene, band, mapset)][1]
+
+def record_band(scene, band, mapset, signature, timestamp):
+    """
+    Append an imported band to the journal
+    """
+    entry = dict(
+            scene=scene,
+            band=band,
+            mapset=mapset,
+            signature=signature,
+            timestamp=timestamp,
+    )
+    with open(JOURNAL['filename'], 'a') as journal_file:
+        journal_file.write(json.dumps(entry) + '\n')
+    JOURNAL['entries'][(scene, band, mapset)] = (signature, timestamp)
+    JOURNAL['scenes'].add(scene)
@@ -10,7 +10,18 @@ grass_environment = grass.gisenv()
 GISDBASE = grass_environment['GISDBASE']
 LOCATION = grass_environment['LOCATION_NAME']
 CELL_MISC = 'cell_misc'
+MTL_GROUP = 'GROUP'
+MTL_END_GROUP = 'END_GROUP'
 
+# parsed MTL files per scene, see read_mtl()
+MTL_CACHE = {}
+
+
+def get_path_to_mapset(mapset):
+    """
+    Return path to the requested Mapset
+    """
+    return '/'.join([GISDBASE, LOCATION, mapset])
 
 def get_path_to_cell_misc(mapset):
     """
@@ -23,17 +34,91 @@ def get_metafile(scene):
     """
     Get metadata MTL filename
     """
-    metafile = str()
-    if glob.glob(scene + '/*MTL.txt') == []:
+    if scene in MTL_CACHE and os.path.exists(MTL_CACHE[scene]['metafile']):
+        return MTL_CACHE[scene]['metafile']
+
+    metafiles = glob.glob(scene + '/*MTL.txt')
+    if not metafiles:
         # grass.warning(_("Found an empty scene directory! Passing..."))
         message = "Missing 'MTL' metadata file!"
         message += f' Skipping import process for scene {scene}.'
         grass.fatal(message)
-    else:
-        metafile = glob.glob(scene + '/*MTL.txt')[0]
-        metafile_basename = os.path.basename(metafile)
-        scene_basename = os.path.basename(scene)
-    return metafile
+    return metafiles[0]
+
+def parse_mtl(lines):
+    """
+    Parse the lines of an MTL metadata file in a single pass
+
+    Parameters
+    ----------
+    lines :
+        Iterable of lines, i.e. an open MTL file
+
+    Returns
+    -------
+    mtl :
+        A nested dictionary in which each GROUP is a dictionary of its
+        fields and sub-groups. Values are strings, stripped off quotes.
+    """
+    mtl = dict()
+    groups = [mtl]
+    for line in lines:
+        key, equals, value = line.partition('=')
+        if not equals:
+            continue
+        key = key.strip()
+        value = value.strip().strip('"')
+
+        if key == MTL_GROUP:
+            group = dict()
+            groups[-1][value] = group
+            groups.append(group)
+
+        elif key == MTL_END_GROUP:
+            if len(groups) > 1:
+                groups.pop()
+
+        else:
+            groups[-1][key] = value
+
+    return mtl
+
+def read_mtl(scene):
+    """
+    Return the parsed MTL metadata file of a scene (see parse_mtl())
+
+    The outcome is cached per scene and is re-parsed only if the
+    modification time of the MTL file changes
+    """
+    metafile = get_metafile(scene)
+    modification_time = os.path.getmtime(metafile)
+    cached = MTL_CACHE.get(scene)
+    if cached and cached['mtime'] == modification_time:
+        return cached['mtl']
+
+    with open(metafile) as mtl_file:
+        mtl = parse_mtl(mtl_file)
+    MTL_CACHE[scene] = {
+            'metafile': metafile,
+            'mtime': modification_time,
+            'mtl': mtl,
+    }
+    return mtl
+
+def find_mtl_value(mtl, keys):
+    """
+    Return the value of the first of the given keys found in any group of a
+    parsed MTL metadata file, or None if none is found
+    """
+    for key in keys:
+        if key in mtl:
+            return mtl[key]
+
+    for value in mtl.values():
+        if isinstance(value, dict):
+            found = find_mtl_value(value, keys)
+            if found is not None:
+                return found
 
 def is_mtl_in_cell_misc(mapset):
     """
@@ -0,0 +1,610 @@
+import math
+import time
+import grass.script as grass
+from grass.script.utils import encode
+from grass.lib import gis as libgis
+from grass.lib import raster as libraster
+from grass.pygrass.gis.region import Region
+from grass.pygrass.raster import RasterRow
+from grass.pygrass.raster.buffer import Buffer
+from univariate import start_statistics
+from univariate import add_statistics
+from univariate import finish_statistics
+
+# GDAL and NumPy are required by the in-process engines and by decoding the
+# QA band only, see require_native_engine()
+try:
+    from osgeo import gdal
+    from osgeo import osr
+    import numpy
+
+except ImportError:
+    gdal = None
+    numpy = None
+
+# import engines, see import_geotiff()
+R_IN_GDAL_ENGINE = 'r.in.gdal'
+NATIVE_ENGINE = 'gdal'
+STACKED_ENGINE = 'stacked'
+NATIVE_ENGINES = [NATIVE_ENGINE, STACKED_ENGINE]
+
+# bands imported on their own by the stacked engine: the panchromatic band
+# is on a finer grid, the quality band is not spectral data
+UNSTACKED_BANDS = [8]
+
+# buffers reused across bands, keyed by shape and type, see get_buffer()
+NATIVE_BUFFERS = {}
+
+# spatial reference of the current Location, see check_projection()
+LOCATION_SRS = {}
+
+
+def require_native_engine():
+    """
+    Fail if the Python bindings of GDAL or NumPy are missing
+    """
+    if gdal is None:
+        message = 'The gdal import engine requires the GDAL Python bindings'
+        message += ' and NumPy'
+        grass.fatal(_(message))
+
+def switch_mapset(mapset):
+    """
+    Switch the current Mapset of this process, for the raster maps written
+    in-process, without touching the GISRC file
+    """
+    libgis.G_setenv_nogisrc(encode('MAPSET'), encode(mapset))
+
+def get_buffer(shape, dtype, mtype=None):
+    """
+    Return a buffer of the requested shape and type, reusing the one
+    allocated for a previous band if possible.  If 'mtype' is given, the
+    buffer is a pygrass Buffer that can be written as a raster row.
+    """
+    key = (shape, numpy.dtype(dtype).str, mtype)
+    if key not in NATIVE_BUFFERS:
+        if mtype:
+            NATIVE_BUFFERS[key] = Buffer(shape, mtype)
+        else:
+            NATIVE_BUFFERS[key] = numpy.empty(shape, dtype=dtype)
+    return NATIVE_BUFFERS[key]
+
+def get_raster_type(data_type):
+    """
+    Return the GRASS raster type for a GDAL data type
+    """
+    if data_type in (gdal.GDT_Byte, gdal.GDT_UInt16, gdal.GDT_Int16, gdal.GDT_Int32):
+        return 'CELL'
+    if data_type == gdal.GDT_Float32:
+        return 'FCELL'
+    return 'DCELL'
+
+def check_projection(dataset):
+    """
+    Check if the projection of a dataset matches the one of the current
+    Location.  The latter is read only once.
+    """
+    if 'srs' not in LOCATION_SRS:
+        LOCATION_SRS['srs'] = osr.SpatialReference(
+                grass.read_command('g.proj', flags='w')
+        )
+    srs = osr.SpatialReference(dataset.GetProjection())
+    return bool(srs.IsSame(LOCATION_SRS['srs']))
+
+def parse_region(region):
+    """
+    Parse a GRASS_REGION string, see get_import_region(), into a dictionary
+    """
+    fields = dict()
+    for item in region.split(';'):
+        key, separator, value = item.partition(':')
+        fields[key.strip()] = value.strip()
+    return fields
+
+def compute_window(transform, columns, rows, region=None):
+    """
+    Return the column and row offsets and the number of columns and rows of
+    the part of a dataset that overlaps the requested region, snapped to
+    the dataset's grid, or None if there is no overlap
+    """
+    west, ew_resolution, row_rotation, north, column_rotation, ns_resolution = transform
+    ns_resolution = abs(ns_resolution)
+    first_column, first_row, last_column, last_row = 0, 0, columns, rows
+    if region:
+        bounds = {
+                key: float(value) for key, value in parse_region(region).items()
+                if key in ('north', 'south', 'east', 'west')
+        }
+        first_column = max(0, math.floor((bounds['west'] - west) / ew_resolution))
+        last_column = min(columns, math.ceil((bounds['east'] - west) / ew_resolution))
+        first_row = max(0, math.floor((north - bounds['north']) / ns_resolution))
+        last_row = min(rows, math.ceil((north - bounds['south']) / ns_resolution))
+        if first_column >= last_column or first_row >= last_row:
+            return None
+
+    return (
+            first_column,
+            first_row,
+            last_column - first_column,
+            last_row - first_row,
+    )
+
+def set_window_region(transform, window):
+    """
+    Set the computational region and the raster window of this process to a
+    window of a dataset
+
+    The raster window is the one raster maps are written in.  It may only be
+    changed while no raster map is open for writing, hence this must be
+    called before opening each raster map written in-process.
+    """
+    west, ew_resolution, row_rotation, north, column_rotation, ns_resolution = transform
+    ns_resolution = abs(ns_resolution)
+    column_offset, row_offset, columns, rows = window
+    region = Region()
+    region.north = north - row_offset * ns_resolution
+    region.south = region.north - rows * ns_resolution
+    region.west = west + column_offset * ew_resolution
+    region.east = region.west + columns * ew_resolution
+    region.rows = rows
+    region.cols = columns
+    region.adjust(rows=True, cols=True)
+    region.set_current()
+    region.set_raster_region()
+
+def is_stackable(band):
+    """
+    Check if a band may be read along with the other bands on the same grid,
+    see import_geotiffs_stacked()
+    """
+    return isinstance(band, int) and band not in UNSTACKED_BANDS
+
+def find_valid_cells(row):
+    """
+    Return a boolean array of the cells of a raster row that are not null
+    """
+    if numpy.issubdtype(row.dtype, numpy.integer):
+        return row != numpy.iinfo(row.dtype).min
+    return ~numpy.isnan(row)
+
+def get_overview_name(name, factor):
+    """
+    Return the name of the coarse companion map of a raster map
+    """
+    return f'{name}_ov{factor}'
+
+def start_overviews(columns, rows, factors):
+    """
+    Prepare the coarse companion maps of a raster map, one per reduction
+    factor, to be fed with each row written to the raster map, see
+    add_overview_row().  Coarse rows are kept in memory, and the companion
+    maps are written once the raster map is closed, see write_overviews(),
+    as only one raster window may be used for writing at a time.
+
+    Returns
+    -------
+    overviews :
+        List of dictionaries holding, for each companion map, the reduction
+        factor, its coarse cells, and the sums and counts of valid values
+        accumulated for its current row
+    """
+    overviews = []
+    for factor in factors:
+        coarse_columns = math.ceil(columns / factor)
+        coarse_rows = math.ceil(rows / factor)
+        overviews.append(
+                dict(
+                    factor=factor,
+                    cells=numpy.full((coarse_rows, coarse_columns), numpy.nan, dtype=numpy.float32),
+                    sums=numpy.zeros(coarse_columns),
+                    counts=numpy.zeros(coarse_columns, dtype=numpy.int64),
+                    row=0,
+                    rows=0,
+                )
+        )
+    return overviews
+
+def add_overview_row(overviews, row, valid):
+    """
+    Accumulate a row of a raster map in each of its companion maps, see
+    start_overviews(), and complete a coarse row every 'factor' rows.
+    Coarse cells are the mean of the valid input cells they cover.
+    """
+    for overview in overviews:
+        columns = numpy.arange(0, len(row), overview['factor'])
+        overview['sums'] += numpy.add.reduceat(numpy.where(valid, row, 0), columns)
+        overview['counts'] += numpy.add.reduceat(valid, columns, dtype=numpy.int64)
+        overview['rows'] += 1
+        if overview['rows'] == overview['factor']:
+            finish_overview_row(overview)
+
+def finish_overview_row(overview):
+    """
+    Store the current coarse row of a companion map and reset it
+    """
+    counts = overview['counts']
+    numpy.divide(
+            overview['sums'],
+            counts,
+            out=overview['cells'][overview['row']],
+            where=counts > 0,
+            casting='unsafe',
+    )
+    overview['sums'][:] = 0
+    counts[:] = 0
+    overview['row'] += 1
+    overview['rows'] = 0
+
+def write_overviews(name, transform, window, overviews, title=None, overwrite=False):
+    """
+    Write the coarse companion maps of a raster map, see start_overviews(),
+    each one on its own grid.  The raster map must be closed beforehand.
+
+    Returns
+    -------
+    error :
+        None if all companion maps were written, else an error message
+    """
+    west, ew_resolution, row_rotation, north, column_rotation, ns_resolution = transform
+    column_offset, row_offset, columns, rows = window
+    west += column_offset * ew_resolution
+    north += row_offset * ns_resolution
+    for overview in overviews:
+        factor = overview['factor']
+        if overview['rows']:  # the last, partial, coarse row
+            finish_overview_row(overview)
+
+        cells = overview['cells']
+        coarse_rows, coarse_columns = cells.shape
+        set_window_region(
+                (west, ew_resolution * factor, 0, north, 0, ns_resolution * factor),
+                (0, 0, coarse_columns, coarse_rows),
+        )
+        raster = RasterRow(get_overview_name(name, factor))
+        row_buffer = get_buffer((coarse_columns,), None, 'FCELL')
+        try:
+            raster.open('w', 'FCELL', overwrite=overwrite)
+            for row in cells:
+                row_buffer[:] = row
+                raster.put_row(row_buffer)
+
+        except Exception as error:
+            return str(error)
+
+        finally:
+            if raster.is_open():
+                raster.close()
+
+        if title:
+            libraster.Rast_put_cell_title(
+                    encode(raster.name),
+                    encode(f'{title}, reduced by {factor}'),
+            )
+
+def import_geotiff_native(parameters, region=None, overviews=None, statistics=None):
+    """
+    Import a single GeoTIFF band in-process: blocks of rows are read via
+    GDAL into a NumPy buffer and written, row by row, to a GRASS raster map
+    via pygrass.  Buffers are reused across bands of the same size and type.
+
+    Parameters
+    ----------
+    parameters :
+        The r.in.gdal parameters of the band, see import_geotiffs()
+
+    region :
+        Optional GRASS_REGION string, see get_import_region()
+
+    overviews :
+        Optional list of reduction factors. Coarse companion maps are fed
+        with the rows as they are written, see start_overviews().
+
+    statistics :
+        Optional dictionary to add the univariate statistics of the band to,
+        keyed by raster map name, see finish_statistics().  They are computed
+        from the blocks of rows as they are written.
+
+    Returns
+    -------
+    error :
+        None if the band was imported successfully, else an error message
+    """
+    dataset = gdal.Open(parameters['input'])
+    if dataset is None:
+        return f'Unable to open {parameters["input"]}'
+
+    if 'o' not in parameters['flags'] and not check_projection(dataset):
+        return 'Projection of dataset does not match the current Location'
+
+    transform = dataset.GetGeoTransform()
+    window = compute_window(
+            transform,
+            dataset.RasterXSize,
+            dataset.RasterYSize,
+            region,
+    )
+    if not window:
+        return 'Dataset does not overlap the region'
+
+    set_window_region(transform, window)
+    column_offset, row_offset, columns, rows = window
+    band = dataset.GetRasterBand(1)
+    mtype = get_raster_type(band.DataType)
+    nodata = band.GetNoDataValue()
+
+    # read as many rows at once as a block of the GeoTIFF file holds
+    block_rows = max(1, band.GetBlockSize()[1])
+    row_buffer = get_buffer((columns,), None, mtype)
+    block_buffer = get_buffer((block_rows, columns), row_buffer.dtype)
+    if mtype == 'CELL':
+        null = numpy.iinfo(row_buffer.dtype).min
+    else:
+        null = numpy.nan
+
+    overwrite = grass.overwrite() or parameters.get('overwrite', False)
+    raster = RasterRow(parameters['output'])
+    coarse_maps = []
+    band_statistics = start_statistics()
+    if overviews:
+        coarse_maps = start_overviews(columns, rows, overviews)
+    try:
+        raster.open('w', mtype, overwrite=overwrite)
+
+        for first_row in range(0, rows, block_rows):
+            block_size = min(block_rows, rows - first_row)
+            block = block_buffer[:block_size]
+            band.ReadAsArray(
+                    column_offset,
+                    row_offset + first_row,
+                    columns,
+                    block_size,
+                    buf_obj=block,
+            )
+            if nodata is not None:
+                block[block == nodata] = null
+            if statistics is not None:
+                add_statistics(band_statistics, block, find_valid_cells(block))
+
+            for row in block:
+                row_buffer[:] = row
+                raster.put_row(row_buffer)
+                if coarse_maps:
+                    add_overview_row(coarse_maps, row_buffer, find_valid_cells(row_buffer))
+
+    except Exception as error:
+        return str(error)
+
+    finally:
+        if raster.is_open():
+            raster.close()
+
+    libraster.Rast_put_cell_title(
+            encode(parameters['output']),
+            encode(parameters['title']),
+    )
+    if statistics is not None:
+        statistics[parameters['output']] = finish_statistics(band_statistics)
+
+    if coarse_maps:
+        return write_overviews(
+                parameters['output'],
+                transform,
+                window,
+                coarse_maps,
+                parameters['title'],
+                overwrite,
+        )
+
+def import_geotiffs_stacked(bands, region=None, overviews=None, statistics=None):
+    """
+    Import multiple GeoTIFF bands in-process, reading the same block of rows
+    from all bands on the same grid in one pass, see import_stack().  The
+    panchromatic and quality bands, and bands alone on their grid, are
+    imported one by one, see import_geotiff_native().
+
+    Parameters
+    ----------
+    bands :
+        List of tuples of a band, as returned by get_name_band(), and its
+        r.in.gdal parameters, see import_geotiffs()
+
+    region :
+        Optional GRASS_REGION string, see get_import_region()
+
+    overviews :
+        Optional list of reduction factors, see import_geotiff_native()
+
+    statistics :
+        Optional dictionary to add univariate statistics to, see
+        import_geotiff_native()
+
+    Returns
+    -------
+    errors :
+        List of None for each band imported successfully, else an error
+        message, in the order of 'bands'
+    """
+    errors = [None] * len(bands)
+    grids = dict()
+    for index, (band, parameters) in enumerate(bands):
+        dataset = None
+        if is_stackable(band):
+            dataset = gdal.Open(parameters['input'])
+        if dataset is None:
+            grids[index] = [(index, parameters, None)]
+            continue
+
+        grid = (
+                dataset.GetGeoTransform(),
+                dataset.RasterXSize,
+                dataset.RasterYSize,
+                dataset.GetRasterBand(1).DataType,
+        )
+        grids.setdefault(grid, []).append((index, parameters, dataset))
+
+    for members in grids.values():
+        start = time.perf_counter()
+        if len(members) == 1:
+            index, parameters, dataset = members[0]
+            errors[index] = import_geotiff_native(
+                    parameters,
+                    region=region,
+                    overviews=overviews,
+                    statistics=statistics,
+            )
+
+        else:
+            error = import_stack(
+                    members,
+                    region=region,
+                    overviews=overviews,
+                    statistics=statistics,
+            )
+            for index, parameters, dataset in members:
+                errors[index] = error
+
+        seconds = time.perf_counter() - start
+        outputs = ', '.join(parameters['output'] for index, parameters, dataset in members)
+        message = f'{outputs} imported via {STACKED_ENGINE} in {seconds:.2f} s'
+        grass.verbose(message)
+
+    return errors
+
+def import_stack(members, region=None, overviews=None, statistics=None):
+    """
+    Import bands on the same grid in-process.  Each block of rows is read
+    from all bands into one NumPy buffer, nodata values of all bands are
+    masked in one vectorized operation, and each band's rows are written to
+    its own GRASS raster map via pygrass.
+
+    Parameters
+    ----------
+    members :
+        List of tuples of an index, the r.in.gdal parameters and the opened
+        GDAL dataset of each band, see import_geotiffs_stacked()
+
+    region :
+        Optional GRASS_REGION string, see get_import_region()
+
+    overviews :
+        Optional list of reduction factors, see import_geotiff_native()
+
+    statistics :
+        Optional dictionary to add univariate statistics to, see
+        import_geotiff_native()
+
+    Returns
+    -------
+    error :
+        None if all bands were imported successfully, else an error message
+    """
+    datasets = [dataset for index, parameters, dataset in members]
+    for index, parameters, dataset in members:
+        if 'o' not in parameters['flags'] and not check_projection(dataset):
+            return 'Projection of dataset does not match the current Location'
+
+    transform = datasets[0].GetGeoTransform()
+    window = compute_window(
+            transform,
+            datasets[0].RasterXSize,
+            datasets[0].RasterYSize,
+            region,
+    )
+    if not window:
+        return 'Dataset does not overlap the region'
+
+    set_window_region(transform, window)
+    column_offset, row_offset, columns, rows = window
+    gdal_bands = [dataset.GetRasterBand(1) for dataset in datasets]
+    mtype = get_raster_type(gdal_bands[0].DataType)
+
+    # NaN never equals any value, hence masks nothing for bands without nodata
+    nodata = numpy.array(
+            [numpy.nan if band.GetNoDataValue() is None else band.GetNoDataValue()
+                for band in gdal_bands]
+    )[:, None, None]
+
+    block_rows = max(1, gdal_bands[0].GetBlockSize()[1])
+    row_buffer = get_buffer((columns,), None, mtype)
+    stack_buffer = get_buffer((len(members), block_rows, columns), row_buffer.dtype)
+    if mtype == 'CELL':
+        null = numpy.iinfo(row_buffer.dtype).min
+    else:
+        null = numpy.nan
+
+    rasters = [RasterRow(parameters['output']) for index, parameters, dataset in members]
+    overwrites = [
+            grass.overwrite() or parameters.get('overwrite', False)
+            for index, parameters, dataset in members
+    ]
+    coarse_maps = [
+            start_overviews(columns, rows, overviews) if overviews else []
+            for raster in rasters
+    ]
+    band_statistics = [start_statistics() for raster in rasters]
+    try:
+        for raster, overwrite in zip(rasters, overwrites):
+            raster.open('w', mtype, overwrite=overwrite)
+
+        for first_row in range(0, rows, block_rows):
+            block_size = min(block_rows, rows - first_row)
+            stack = stack_buffer[:, :block_size]
+            for layer, band in enumerate(gdal_bands):
+                band.ReadAsArray(
+                        column_offset,
+                        row_offset + first_row,
+                        columns,
+                        block_size,
+                        buf_obj=stack_buffer[layer, :block_size],
+                )
+            stack[stack == nodata] = null
+            if statistics is not None:
+                valid = find_valid_cells(stack)
+                for layer, layer_statistics in enumerate(band_statistics):
+                    add_statistics(layer_statistics, stack[layer], valid[layer])
+
+            for layer, raster in enumerate(rasters):
+                for row in stack[layer]:
+                    row_buffer[:] = row
+                    raster.put_row(row_buffer)
+                    if coarse_maps[layer]:
+                        add_overview_row(
+                                coarse_maps[layer],
+                                row_buffer,
+                                find_valid_cells(row_buffer),
+                        )
+
+    except Exception as error:
+        return str(error)
+
+    finally:
+        for raster in rasters:
+            if raster.is_open():
+                raster.close()
+
+    for (index, parameters, dataset), layer_statistics in zip(members, band_statistics):
+        libraster.Rast_put_cell_title(
+                encode(parameters['output']),
+                encode(parameters['title']),
+        )
+        if statistics is not None:
+            statistics[parameters['output']] = finish_statistics(layer_statistics)
+
+    # companion maps last, each one on its own grid
+    for (index, parameters, dataset), layer_maps, overwrite in zip(
+            members,
+            coarse_maps,
+            overwrites,
+    ):
+        if not layer_maps:
+            continue
+        error = write_overviews(
+                parameters['output'],
+                transform,
+                window,
+                layer_maps,
+                parameters['title'],
+                overwrite,
+        )
+        if error:
+            return error
@@ -0,0 +1,187 @@
+import os
+import sys
+import shutil
+import tempfile
+import multiprocessing
+import grass.script as grass
+from grass.pygrass.modules.shortcuts import general as g
+from constants import HORIZONTAL_LINE
+from helpers import PROVISIONED_MAPSET
+from metadata import get_path_to_mapset
+from scenes import import_scene
+from tar import get_scene_directory
+
+
+def private_gisrc(directory):
+    """
+    Copy the session's GISRC file inside 'directory' and return the path to
+    the copy.  Commands run with the copy, such as 'g.mapset', do not alter
+    the session of the user or of any other worker.
+    """
+    handle, gisrc = tempfile.mkstemp(prefix='gisrc_', dir=directory)
+    os.close(handle)
+    shutil.copy(os.environ['GISRC'], gisrc)
+    return gisrc
+
+def create_mapset(mapset):
+    """
+    Create a Mapset, if it doesn't exist, as 'g.mapset -c' does, yet without
+    switching to it and thus without locking it
+    """
+    path = get_path_to_mapset(mapset)
+    if os.path.isdir(path):
+        return
+
+    os.makedirs(path)
+    shutil.copy(
+            os.path.join(get_path_to_mapset('PERMANENT'), 'DEFAULT_WIND'),
+            os.path.join(path, 'WIND'),
+    )
+
+def initialize_worker(directory, mapset=None):
+    """
+    Give each worker process its own GISRC file so that switching to a
+    scene's Mapset does not interfere with other workers
+
+    In single Mapset mode, the worker's GISRC file points straight at the
+    target Mapset, which no worker ever switches to via 'g.mapset', see
+    provision_mapset().  Hence, no worker contends for its lock.
+    """
+    os.environ['GISRC'] = private_gisrc(directory)
+    if mapset:
+        grass.run_command('g.gisenv', set=f'MAPSET={mapset}', quiet=True)
+        PROVISIONED_MAPSET['name'] = mapset
+
+def import_scene_worker(arguments):
+    """
+    Import a single scene inside a worker process while collecting all
+    messages written to the standard error stream
+
+    Returns
+    -------
+    A tuple of the scene, its t.register compliant timestamp (or None on
+    failure), the band files that failed to import, the collected log and an
+    error message (or None on success)
+    """
+    landsat_scene, import_options = arguments
+    tgis_timestamp = None
+    failed_bands = []
+    error = None
+    with tempfile.TemporaryFile(mode='w+') as log:
+        sys.stderr.flush()
+        stderr = os.dup(2)
+        os.dup2(log.fileno(), 2)
+        try:
+            tgis_timestamp, failed_bands = import_scene(landsat_scene, **import_options)
+        except SystemExit:
+            error = 'fatal error, see messages above'
+        except Exception as exception:
+            error = str(exception) or exception.__class__.__name__
+        finally:
+            sys.stderr.flush()
+            os.dup2(stderr, 2)
+            os.close(stderr)
+        log.seek(0)
+        messages = log.read()
+    return landsat_scene, tgis_timestamp, failed_bands, messages, error
+
+def drop_duplicate_scenes(landsat_scenes):
+    """
+    Yield each Landsat scene once, leaving out other deliveries of a scene
+    already yielded, i.e. the unpacked directory next to its tar file
+
+    Scenes of the same name share their unpacking directory, their Mapset
+    and their raster map names, hence must never be imported concurrently.
+    """
+    scenes = set()
+    for landsat_scene in landsat_scenes:
+        scene = get_scene_directory(landsat_scene)
+        if scene in scenes:
+            message = f'Skipping {landsat_scene}, scene {scene} is imported'
+            message += ' from another source already'
+            grass.warning(message)
+            continue
+        scenes.add(scene)
+        yield landsat_scene
+
+def import_scenes_in_parallel(
+        landsat_scenes,
+        nprocs,
+        import_options,
+        on_imported=None,
+    ):
+    """
+    Import multiple scenes concurrently in a bounded pool of worker processes
+
+    Each worker operates on a private copy of the GISRC file and thus on its
+    own current Mapset.  In single Mapset mode, the target Mapset is created
+    once, before any worker starts, and is the current Mapset of every
+    worker from the start, see initialize_worker().  Workers then only ever
+    write distinct raster maps in it.  Each scene is imported only once, see
+    drop_duplicate_scenes(), so that no two workers ever write into the same
+    scene directory, Mapset or raster map.  The log of each scene is printed
+    in input order.
+
+    Parameters
+    ----------
+    landsat_scenes :
+        Iterable of Landsat scenes, consumed while scenes are being imported
+
+    nprocs :
+        Number of worker processes
+
+    import_options :
+        Keyword arguments passed to import_scene()
+
+    on_imported :
+        Optional function called, in the parent process, with each scene
+        and whether it, or any of its bands, failed to import, i.e. to
+        record it in a scene catalog
+
+    Returns
+    -------
+    tgis_timestamps :
+        List of t.register compliant timestamps of successfully imported
+        scenes, in input order
+    """
+    directory = tempfile.mkdtemp(prefix='i.landsat.import_')
+    mapset = None
+    if import_options['single_mapset']:
+        mapset = import_options['mapset']
+        create_mapset(mapset)
+
+    tgis_timestamps = []
+    failed_scenes = []
+    tasks = (
+            (landsat_scene, import_options)
+            for landsat_scene in drop_duplicate_scenes(landsat_scenes)
+    )
+    try:
+        with multiprocessing.Pool(
+                processes=nprocs,
+                initializer=initialize_worker,
+                initargs=(directory, mapset),
+        ) as pool:
+            for landsat_scene, tgis_timestamp, failed_bands, messages, error in pool.imap(
+                    import_scene_worker,
+                    tasks,
+            ):
+                sys.stderr.write(messages)
+                sys.stderr.flush()
+                if error:
+                    failed_scenes.append(landsat_scene)
+                    grass.warning(f'Importing scene {landsat_scene} failed: {error}')
+                else:
+                    tgis_timestamps.append(tgis_timestamp)
+                if on_imported:
+                    on_imported(landsat_scene, bool(error or failed_bands))
+                g.message(HORIZONTAL_LINE)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if failed_scenes:
+        message = f'Failed to import {len(failed_scenes)} scene(s): '
+        message += ', '.join(failed_scenes)
+        grass.warning(message)
+
+    return tgis_timestamps
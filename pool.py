@@ -0,0 +1,214 @@
+import os
+import glob
+from datetime import datetime
+import grass.script as grass
+from grass.pygrass.modules.shortcuts import general as g
+from constants import CLOUD_COVER_STRINGS
+from identify import parse_product_identifier
+from metadata import read_mtl
+from metadata import find_mtl_value
+from tar import get_scene_directory
+from tar import is_tar
+from tar import read_mtl_from_tar
+
+# collection option values, see match_scene()
+POOL_COLLECTIONS = {
+        'pre': 'Pre-Collection',
+        '1': 'Collection 1',
+        '2': 'Collection 2',
+}
+
+
+def discover_scenes(pool, recursive=False):
+    """
+    Yield Landsat scenes found in a pool directory, one by one, as the pool
+    is being listed
+
+    Only directories and (compressed) tar files named after a known product
+    identifier are yielded.  Anything else, i.e. partial downloads, the
+    member index of tar files (see read_tar_index()) or unrelated files, is
+    left out.
+
+    Parameters
+    ----------
+    pool :
+        Directory containing Landsat scenes
+
+    recursive :
+        Search sub-directories which are not Landsat scenes themselves
+
+    Yields
+    ------
+    Path to each Landsat scene directory or (compressed) tar file, in the
+    order they are listed by the file system
+    """
+    with os.scandir(pool) as entries:
+        for entry in entries:
+            is_directory = entry.is_dir()
+            scene = get_scene_directory(entry.name)
+            if (
+                    (is_directory or is_tar(entry.name))
+                    and parse_product_identifier(scene)
+            ):
+                yield entry.path
+
+            elif recursive and is_directory:
+                yield from discover_scenes(entry.path, recursive)
+
+def parse_wrs(wrs):
+    """
+    Parse 'path/row' strings, i.e. '192/29' or '192', into tuples of zero
+    padded path and row, or None for any row
+    """
+    wrs_tiles = []
+    for tile in wrs:
+        path, separator, row = tile.partition('/')
+        if not path.isdigit() or (row and not row.isdigit()):
+            grass.fatal(_(f'Invalid WRS path/row: {tile}'))
+        wrs_tiles.append((path.zfill(3), row.zfill(3) if row else None))
+    return wrs_tiles
+
+def parse_date(date_string):
+    """
+    Parse a YYYY-MM-DD string into a date, if any
+    """
+    if not date_string:
+        return None
+
+    try:
+        return datetime.strptime(date_string, '%Y-%m-%d').date()
+
+    except ValueError:
+        grass.fatal(_(f'Invalid date {date_string}, should be YYYY-MM-DD'))
+
+def match_scene(
+        landsat_scene,
+        wrs=None,
+        start_date=None,
+        end_date=None,
+        sensors=None,
+        tiers=None,
+        collections=None,
+    ):
+    """
+    Check if the product identifier of a Landsat scene matches the requested
+    filters.  Filters left to None match any scene.
+
+    Parameters
+    ----------
+    landsat_scene :
+        Path to a Landsat scene directory or (compressed) tar file
+
+    wrs :
+        List of (path, row) tuples, see parse_wrs()
+
+    start_date, end_date :
+        First and last date of acquisition, inclusive
+
+    sensors :
+        List of sensor letters, i.e. 'C', 'E'
+
+    tiers :
+        List of collection categories, i.e. 'T1', 'RT'
+
+    collections :
+        List of collection names, i.e. 'Collection 2'
+    """
+    product_identifier = parse_product_identifier(get_scene_directory(landsat_scene))
+    if not product_identifier:
+        return False
+
+    if wrs and not any(
+            product_identifier.path == path
+            and row in (None, product_identifier.row)
+            for path, row in wrs
+    ):
+        return False
+
+    acquisition_date = product_identifier.acquisition_date
+    if start_date and acquisition_date < start_date:
+        return False
+
+    if end_date and acquisition_date > end_date:
+        return False
+
+    if sensors and product_identifier.sensor not in sensors:
+        return False
+
+    if tiers and product_identifier.category not in tiers:
+        return False
+
+    if collections and product_identifier.collection not in collections:
+        return False
+
+    return True
+
+def filter_scenes(landsat_scenes, **filters):
+    """
+    Yield the Landsat scenes that match the requested filters, see
+    match_scene()
+    """
+    for landsat_scene in landsat_scenes:
+        if match_scene(landsat_scene, **filters):
+            yield landsat_scene
+
+def read_cloud_cover(landsat_scene):
+    """
+    Return the cloud cover, in percent, recorded in the MTL file of a Landsat
+    scene, or None if it is unknown. Only the MTL member of a tar file is
+    read, the tar file is not extracted.
+    """
+    mtl = None
+    if is_tar(landsat_scene):
+        mtl = read_mtl_from_tar(landsat_scene)
+
+    elif glob.glob(landsat_scene + '/*MTL.txt'):
+        mtl = read_mtl(landsat_scene)
+
+    if not mtl:
+        return None
+
+    cloud_cover = find_mtl_value(mtl, CLOUD_COVER_STRINGS)
+    try:
+        cloud_cover = float(cloud_cover)
+
+    except (TypeError, ValueError):
+        return None
+
+    # i.e. -1 for scenes whose cloud cover was not assessed
+    return cloud_cover if cloud_cover >= 0 else None
+
+def match_cloud_cover(landsat_scene, max_cloud_cover, find_cloud_cover=read_cloud_cover):
+    """
+    Check if the cloud cover of a Landsat scene is at most 'max_cloud_cover'
+    percent. Scenes of unknown cloud cover match.
+
+    Parameters
+    ----------
+    landsat_scene :
+        Path to a Landsat scene directory or (compressed) tar file
+
+    max_cloud_cover :
+        Maximum cloud cover in percent
+
+    find_cloud_cover :
+        Function that accepts a scene and returns its cloud cover, i.e.
+        read_cloud_cover() or a catalog lookup
+    """
+    cloud_cover = find_cloud_cover(landsat_scene)
+    return cloud_cover is None or cloud_cover <= max_cloud_cover
+
+def filter_cloudy_scenes(landsat_scenes, max_cloud_cover, find_cloud_cover=read_cloud_cover):
+    """
+    Yield the Landsat scenes whose cloud cover is at most 'max_cloud_cover'
+    percent, see match_cloud_cover(), and report every scene left out. No
+    scene is extracted or imported to evaluate the filter.
+    """
+    for landsat_scene in landsat_scenes:
+        cloud_cover = find_cloud_cover(landsat_scene)
+        if cloud_cover is not None and cloud_cover > max_cloud_cover:
+            message = f'Skipping {get_scene_directory(landsat_scene)}'
+            message += f', cloud cover {cloud_cover}% exceeds {max_cloud_cover}%'
+            g.message(message)
+            continue
+        yield landsat_scene
@@ -0,0 +1,86 @@
+import os
+import struct
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import grass.script as grass
+from constants import GZIP_EXTENSIONS
+from tar import is_tar
+
+MEGABYTE = 1024 ** 2
+
+
+def estimate_unpacked_size(landsat_scene):
+    """
+    Estimate the disk space, in bytes, required to unpack a scene. For a
+    tar.gz file, this is read from the gzip trailer which records the size
+    of the uncompressed data (modulo 4 GiB). Directories require no space.
+    """
+    if not is_tar(landsat_scene):
+        return 0
+
+    size = os.path.getsize(landsat_scene)
+    if not any(landsat_scene.endswith(extension) for extension in GZIP_EXTENSIONS):
+        return size
+
+    try:
+        with open(landsat_scene, 'rb') as archive:
+            archive.seek(-4, os.SEEK_END)
+            unpacked_size = struct.unpack('<I', archive.read(4))[0]
+    except (OSError, struct.error):
+        return size
+    return max(size, unpacked_size)
+
+def prefetch_scenes(landsat_scenes, unpack, depth, reserve):
+    """
+    Unpack up to 'depth' upcoming scenes in background threads while the
+    current scene is being imported
+
+    An upcoming scene is unpacked only if the free space in the current
+    working directory, minus the space claimed by scenes still being
+    unpacked, can hold it and still leave 'reserve' megabytes free. The next
+    scene to import is always unpacked, regardless of the free space.
+
+    Parameters
+    ----------
+    landsat_scenes :
+        Iterable of Landsat scenes
+
+    unpack :
+        Function that accepts a scene and returns the outcome of
+        unpack_scene()
+
+    depth :
+        Maximum number of scenes to unpack ahead of the current one
+
+    reserve :
+        Disk space, in megabytes, to keep free
+
+    Yields
+    ------
+    Tuples of a scene and the outcome of unpack()
+    """
+    landsat_scenes = iter(landsat_scenes)
+    upcoming = next(landsat_scenes, None)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=depth + 1) as executor:
+        while upcoming is not None or pending:
+
+            while upcoming is not None and len(pending) <= depth:
+                size = estimate_unpacked_size(upcoming)
+                claimed = sum(
+                        item[1] for item in pending if not item[2].done()
+                )
+                free = shutil.disk_usage(os.getcwd()).free
+                if pending and free - claimed - size < reserve * MEGABYTE:
+                    message = f'Postponing unpacking of {upcoming}'
+                    message += f', less than {reserve} MB would remain free'
+                    grass.verbose(message)
+                    break
+                future = executor.submit(unpack, upcoming)
+                pending.append((upcoming, size, future))
+                upcoming = next(landsat_scenes, None)
+
+            landsat_scene, size, future = pending.popleft()
+            yield landsat_scene, future.result()
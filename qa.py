@@ -0,0 +1,171 @@
+from functools import lru_cache
+import grass.script as grass
+from grass.pygrass.raster import RasterRow
+from native import compute_window
+from native import set_window_region
+from native import get_buffer
+from native import gdal
+from native import numpy
+
+# bit fields of the quality assessment band, per collection, as tuples of
+# the offset and width of each field, and the minimum value that sets the
+# mask, i.e. 3 for 'high' confidence in two-bit fields
+QA_BITS = {
+        'Collection 1': {
+            'fill': (0, 1, 1),
+            'cloud': (4, 1, 1),
+            'cloud_shadow': (7, 2, 3),
+            'snow': (9, 2, 3),
+            'cirrus': (11, 2, 3),
+        },
+        'Collection 2': {
+            'fill': (0, 1, 1),
+            'dilated_cloud': (1, 1, 1),
+            'cirrus': (2, 1, 1),
+            'cloud': (3, 1, 1),
+            'cloud_shadow': (4, 1, 1),
+            'snow': (5, 1, 1),
+            'water': (7, 1, 1),
+        },
+}
+QA_MASKS = sorted(set(mask for bits in QA_BITS.values() for mask in bits))
+QA_VALUES = 2 ** 16
+QA_FILL = 'fill'
+QA_CLOUD = 'cloud'
+
+
+@lru_cache(maxsize=None)
+def build_lookup_table(collection, mask):
+    """
+    Return a lookup table of the requested mask for every possible 16-bit
+    value of the quality assessment band, or None if the collection lacks
+    the bit field
+    """
+    if mask not in QA_BITS.get(collection, {}):
+        return None
+
+    offset, width, minimum = QA_BITS[collection][mask]
+    values = numpy.arange(QA_VALUES, dtype=numpy.int64)
+    field = (values >> offset) & (2 ** width - 1)
+    return (field >= minimum).astype(numpy.int32)
+
+def get_mask_name(name, mask):
+    """
+    Return the name of the raster map of a mask decoded from the quality
+    assessment band
+    """
+    return f'{name}_{mask}'
+
+def decode_qa(filename, name, collection, masks, region=None, skip=()):
+    """
+    Decode the bit fields of a quality assessment band into masks, in a
+    single pass over the band: each block of rows is read via GDAL and
+    mapped to every requested mask through a lookup table. Masks are
+    written as CELL raster maps of 0 and 1, null where the band has no
+    data.
+
+    Parameters
+    ----------
+    filename :
+        Path to the quality assessment band file, or GDAL virtual file
+        system path
+
+    name :
+        Name of the raster map of the quality assessment band. Masks are
+        named after it, see get_mask_name()
+
+    collection :
+        Product collection, see QA_BITS
+
+    masks :
+        List of masks to decode, see QA_MASKS
+
+    region :
+        Optional GRASS_REGION string, see get_import_region()
+
+    skip :
+        Names of masks to decode without writing them, i.e. existing ones
+
+    Returns
+    -------
+    A tuple of the names of the written raster maps, the percentage of
+    cloudy cells among the cells that are not fill, or None if the
+    collection lacks a cloud bit, and an error message or None
+    """
+    if collection not in QA_BITS:
+        return [], None, f'Unknown bit fields of the {collection} quality band'
+
+    dataset = gdal.Open(filename)
+    if dataset is None:
+        return [], None, f'Unable to open {filename}'
+
+    tables = dict()
+    for mask in set(masks) | {QA_FILL, QA_CLOUD}:
+        table = build_lookup_table(collection, mask)
+        if table is None:
+            if mask in masks:
+                grass.warning(f'No {mask} bits in the {collection} quality band')
+            continue
+        tables[mask] = table
+
+    transform = dataset.GetGeoTransform()
+    window = compute_window(
+            transform,
+            dataset.RasterXSize,
+            dataset.RasterYSize,
+            region,
+    )
+    if not window:
+        return [], None, 'Dataset does not overlap the region'
+
+    set_window_region(transform, window)
+    column_offset, row_offset, columns, rows = window
+    band = dataset.GetRasterBand(1)
+    block_rows = max(1, band.GetBlockSize()[1])
+    block_buffer = get_buffer((block_rows, columns), numpy.uint16)
+    row_buffer = get_buffer((columns,), None, 'CELL')
+    null = numpy.iinfo(row_buffer.dtype).min
+
+    written = [mask for mask in masks if mask in tables and mask not in skip]
+    rasters = [RasterRow(get_mask_name(name, mask)) for mask in written]
+    cloudy = 0
+    valid = 0
+    try:
+        for raster in rasters:
+            raster.open('w', 'CELL', overwrite=grass.overwrite())
+
+        for first_row in range(0, rows, block_rows):
+            block_size = min(block_rows, rows - first_row)
+            block = block_buffer[:block_size]
+            band.ReadAsArray(
+                    column_offset,
+                    row_offset + first_row,
+                    columns,
+                    block_size,
+                    buf_obj=block,
+            )
+            fill = tables[QA_FILL][block].astype(bool)
+            valid += block.size - int(fill.sum())
+            if QA_CLOUD in tables:
+                cloudy += int(tables[QA_CLOUD][block][~fill].sum())
+
+            for mask, raster in zip(written, rasters):
+                decoded = tables[mask][block]
+                if mask != QA_FILL:
+                    decoded[fill] = null
+                for row in decoded:
+                    row_buffer[:] = row
+                    raster.put_row(row_buffer)
+
+    except Exception as error:
+        return [], None, str(error)
+
+    finally:
+        for raster in rasters:
+            if raster.is_open():
+                raster.close()
+
+    cloud_cover = None
+    if QA_CLOUD in tables:
+        cloud_cover = 100.0 * cloudy / valid if valid else 100.0
+    return [raster.name for raster in rasters], cloud_cover, None
@@ -0,0 +1,455 @@
+import os
+import shutil
+import grass.script as grass
+from timestamp import build_tgis_timestamp
+from timestamp import needs_mtl
+from timestamp import retrieve_timestamp
+from bands import get_name_band
+from bands import list_requested_bands
+from bands import match_band_filenames
+from bands import retrieve_band_filenames
+from constants import QA_STRING
+from tar import extract_tgz
+from tar import find_mtl_member
+from tar import get_scene_directory
+from tar import get_vsitar_path
+from tar import is_mtl_member
+from tar import is_gzip
+from tar import is_tar
+from tar import list_tar_members
+from geotiff import import_geotiffs
+from journal import open_journal
+from journal import get_source_signature
+from journal import check_journal
+from journal import find_journaled_timestamp
+from journal import is_scene_journaled
+from journal import JOURNALED
+
+
+def select_band_members(requested_bands, scene_directory):
+    """
+    Return a function that selects the MTL file and the requested bands
+    among the members of a tar file, see extract_tgz().  Members are matched
+    one by one, as they may stream by before the tar file is indexed.
+    """
+    def select(member):
+        """Select the MTL file and the requested bands"""
+        if is_mtl_member(member):
+            return True
+        return bool(
+                match_band_filenames(
+                    bands=requested_bands,
+                    scene=scene_directory,
+                    filenames=[member],
+                )
+        )
+    return select
+
+def unpack_scene(
+        landsat_scene,
+        bands,
+        spectral_sets,
+        stream_tar=False,
+        quality_first=False,
+    ):
+    """
+    Unpack a Landsat scene, if it is a (compressed) tar file
+
+    Parameters
+    ----------
+    landsat_scene :
+        Path to a Landsat scene directory or (compressed) tar file
+
+    bands :
+        List of user requested bands
+
+    spectral_sets :
+        List of user requested spectral sets
+
+    stream_tar :
+        Read the bands of a tar.gz file directly from the archive via GDAL's
+        /vsitar/ virtual file system. Only the MTL file is extracted.
+        Otherwise, only the MTL file and the requested bands are extracted.
+
+    quality_first :
+        Unless streaming, extract only the MTL file and the quality
+        assessment band of an uncompressed tar file.  The other requested
+        bands are extracted once the quality band is decoded, see
+        unpack_spectral_bands().  Members of a compressed tar file cannot be
+        read out of order, hence all requested bands are extracted at once.
+
+    Returns
+    -------
+    A tuple of the scene directory, the filenames to select bands from (None
+    to list the scene directory), the source to read bands from (None to
+    read from the scene directory) and whether the scene was compressed
+    """
+    filenames = None
+    source = None
+    compressed = is_tar(landsat_scene)
+    if compressed:
+        archive = landsat_scene
+        scene_directory = get_scene_directory(archive)
+        requested_bands = list_requested_bands(
+                bands,
+                spectral_sets,
+                scene_directory,
+        )
+        if stream_tar:
+            requested_bands = []
+        elif quality_first and not is_gzip(archive):
+            requested_bands = [band for band in requested_bands if band == QA_STRING]
+
+        landsat_scene, members = extract_tgz(
+                archive,
+                select=select_band_members(requested_bands, scene_directory),
+        )
+        if stream_tar:
+            filenames = members
+            mtl_member = find_mtl_member(members)
+            source = get_vsitar_path(archive, [mtl_member] if mtl_member else [])
+            message = f'Scene {landsat_scene} will be read from {source}'
+        else:
+            message = f'Scene {landsat_scene} decompressed and unpacked'
+        grass.verbose(message)
+
+    return landsat_scene, filenames, source, compressed
+
+def unpack_spectral_bands(landsat_scene, bands, spectral_sets):
+    """
+    Extract the requested bands, other than the quality assessment band, of
+    a tar file whose MTL file and quality band are extracted already, see
+    unpack_scene()
+
+    Returns
+    -------
+    The band files of all requested bands, see retrieve_band_filenames()
+    """
+    scene_directory = get_scene_directory(landsat_scene)
+    requested_bands = [
+            band for band in list_requested_bands(bands, spectral_sets, scene_directory)
+            if band != QA_STRING
+    ]
+    extract_tgz(
+            landsat_scene,
+            select=select_band_members(requested_bands, scene_directory),
+    )
+    grass.verbose(f'Spectral bands of scene {scene_directory} unpacked')
+    return retrieve_band_filenames(
+            bands=list(bands),
+            spectral_sets=list(spectral_sets),
+            scene=scene_directory,
+    )
+
+def find_journaled_scene(
+        landsat_scene,
+        bands,
+        spectral_sets,
+        mapset,
+        single_mapset=False,
+        journal=None,
+    ):
+    """
+    Check if all requested bands of a scene are recorded in the import
+    journal as imported from an unchanged source, without unpacking the
+    scene.  The bands of a tar file are matched against its member index.
+
+    Returns
+    -------
+    timestamp :
+        The timestamp of the scene recorded in the journal, or None if any
+        requested band is yet to be imported
+    """
+    if not journal:
+        return None
+
+    open_journal(journal)
+    scene_directory = get_scene_directory(landsat_scene)
+
+    # members of a tar file are listed only for scenes in the journal, as
+    # indexing a compressed tar file decompresses it
+    if not is_scene_journaled(scene_directory):
+        return None
+
+    filenames = None
+    if is_tar(landsat_scene):
+        filenames = list_tar_members(landsat_scene)
+    if not single_mapset:
+        mapset = scene_directory
+
+    band_files = match_band_filenames(
+            bands=list_requested_bands(bands, spectral_sets, scene_directory),
+            scene=scene_directory if filenames is not None else landsat_scene,
+            filenames=filenames,
+    )
+    if not band_files:
+        return None
+
+    for band_file in band_files:
+        name, band = get_name_band(scene_directory, band_file, single_mapset)
+        source = landsat_scene
+        if filenames is None:
+            source = band_file.path
+        signature = get_source_signature(source)
+        if check_journal(scene_directory, name, mapset, signature) != JOURNALED:
+            return None
+
+    return find_journaled_timestamp(scene_directory, name, mapset)
+
+def unpack_pending_scene(
+        landsat_scene,
+        bands,
+        spectral_sets,
+        mapset,
+        single_mapset=False,
+        stream_tar=False,
+        journal=None,
+        quality_first=False,
+    ):
+    """
+    Unpack a Landsat scene, see unpack_scene(), unless all its requested
+    bands are recorded in the import journal, see find_journaled_scene()
+
+    Returns
+    -------
+    The outcome of unpack_scene(), or None for a journaled scene
+    """
+    if find_journaled_scene(
+            landsat_scene,
+            bands=bands,
+            spectral_sets=spectral_sets,
+            mapset=mapset,
+            single_mapset=single_mapset,
+            journal=journal,
+    ):
+        return None
+
+    return unpack_scene(
+            landsat_scene,
+            bands=bands,
+            spectral_sets=spectral_sets,
+            stream_tar=stream_tar,
+            quality_first=quality_first,
+    )
+
+def import_scene(
+        landsat_scene,
+        bands,
+        spectral_sets,
+        mapset,
+        memory,
+        override_projection=False,
+        prefix=None,
+        link_geotiffs=False,
+        skip_import=True,
+        remove_untarred=False,
+        single_mapset=False,
+        list_bands=False,
+        list_timestamps=False,
+        tgis_output=None,
+        force_timestamp=False,
+        do_not_timestamp=False,
+        skip_microseconds=False,
+        copy_mtl=True,
+        band_workers=1,
+        stream_tar=False,
+        unpacked=None,
+        metadata_source='mtl',
+        journal=None,
+        region=None,
+        engine='r.in.gdal',
+        cog_directory=None,
+        overviews=None,
+        compute_statistics=False,
+        qa_masks=None,
+        cloud_threshold=None,
+    ):
+    """
+    Decompress (if required), time-stamp and import the requested bands of a
+    single Landsat scene
+
+    Parameters
+    ----------
+    landsat_scene :
+        Path to a Landsat scene directory or (compressed) tar file
+
+    bands :
+        List of user requested bands
+
+    spectral_sets :
+        List of user requested spectral sets
+
+    mapset :
+        Name of mapset to import to
+
+    stream_tar :
+        See unpack_scene()
+
+    unpacked :
+        The outcome of unpack_scene(), if the scene is already unpacked.
+        Along with 'cloud_threshold', it must be unpacked quality first.
+
+    metadata_source :
+        Source of the timestamp, see retrieve_timestamp(). When only listing
+        timestamps from product identifiers or of tar files, the scene is
+        not unpacked.
+
+    journal :
+        Import journal file, see open_journal(). Along with 'skip_import',
+        scenes whose requested bands are all journaled are skipped without
+        unpacking them or provisioning their Mapset.
+
+    For the remaining parameters, see import_geotiffs()
+
+    Returns
+    -------
+    A tuple of a t.register compliant timestamp string for the scene and the
+    list of the band files that failed to import
+    """
+    # tar files are not unpacked for listing, their MTL file is read in place
+    if list_timestamps and (
+            is_tar(landsat_scene)
+            or not needs_mtl(landsat_scene, metadata_source)
+    ):
+        timestamp = retrieve_timestamp(
+                landsat_scene,
+                metadata_source,
+                skip_microseconds=skip_microseconds,
+        )
+        tgis_timestamp = build_tgis_timestamp(
+                prefix=prefix,
+                scene=get_scene_directory(landsat_scene),
+                timestamp=timestamp,
+        )
+        return tgis_timestamp, []
+
+    resume = (
+            journal
+            and skip_import
+            and not grass.overwrite()
+            and not any(x for x in (list_bands, list_timestamps))
+    )
+    if resume and unpacked is None:
+        timestamp = find_journaled_scene(
+                landsat_scene,
+                bands=bands,
+                spectral_sets=spectral_sets,
+                mapset=mapset,
+                single_mapset=single_mapset,
+                journal=journal,
+        )
+        if timestamp:
+            scene = get_scene_directory(landsat_scene)
+            message = f'Scene {scene} is journaled as imported, skipping'
+            grass.verbose(message)
+            tgis_timestamp = build_tgis_timestamp(
+                    prefix=prefix,
+                    scene=scene,
+                    timestamp=timestamp,
+            )
+            return tgis_timestamp, []
+
+    archive = landsat_scene if is_tar(landsat_scene) else None
+
+    # decode the quality band of an uncompressed tar file before extracting
+    # spectral bands that may not be imported, see decode_qa_masks(). The
+    # members of a compressed tar file are all extracted in a single pass.
+    quality_first = (
+            cloud_threshold is not None
+            and not any(x for x in (list_bands, list_timestamps))
+    )
+    spectral_bands = None
+    if quality_first and archive and not stream_tar and not is_gzip(archive):
+        spectral_bands = lambda: unpack_spectral_bands(
+                archive,
+                bands=bands,
+                spectral_sets=spectral_sets,
+        )
+
+    if unpacked is None:
+        unpacked = unpack_scene(
+                landsat_scene,
+                bands=bands,
+                spectral_sets=spectral_sets,
+                stream_tar=stream_tar,
+                quality_first=quality_first,
+        )
+    landsat_scene, filenames, source, compressed = unpacked
+
+    timestamp = retrieve_timestamp(
+                    scene=landsat_scene,
+                    metadata_source=metadata_source,
+                    skip_microseconds=skip_microseconds,
+                )
+    tgis_timestamp = build_tgis_timestamp(
+                        prefix=prefix,
+                        scene=os.path.basename(landsat_scene),
+                        timestamp=timestamp,
+                    )
+
+    failed_bands = []
+    if not list_timestamps:
+        failed_bands = import_bands(
+                landsat_scene,
+                bands=bands,
+                spectral_sets=spectral_sets,
+                filenames=filenames,
+                source=source,
+                timestamp=timestamp,
+                mapset=mapset,
+                memory=memory,
+                override_projection=override_projection,
+                prefix=prefix,
+                link_geotiffs=link_geotiffs,
+                skip_import=skip_import,
+                single_mapset=single_mapset,
+                list_bands=list_bands,
+                tgis_output=tgis_output,
+                force_timestamp=force_timestamp,
+                do_not_timestamp=do_not_timestamp,
+                skip_microseconds=skip_microseconds,
+                copy_mtl=copy_mtl,
+                band_workers=band_workers,
+                journal=journal,
+                archive=archive,
+                region=region,
+                engine=engine,
+                cog_directory=cog_directory,
+                overviews=overviews,
+                compute_statistics=compute_statistics,
+                qa_masks=qa_masks,
+                cloud_threshold=cloud_threshold,
+                unpack_spectral_bands=spectral_bands,
+        )
+
+    if remove_untarred and compressed:
+        message = f'Removing unpacked source directory {landsat_scene}'
+        grass.verbose(message)
+        shutil.rmtree(landsat_scene)
+
+    return tgis_timestamp, failed_bands
+
+def import_bands(
+        landsat_scene,
+        bands,
+        spectral_sets,
+        filenames,
+        source,
+        **import_options
+    ):
+    """
+    Match the requested bands of an unpacked scene and import them, see
+    import_geotiffs() for the import options and the outcome
+    """
+    band_filenames = retrieve_band_filenames(
+                        bands=list(bands),
+                        spectral_sets=list(spectral_sets),
+                        scene=landsat_scene,
+                        filenames=filenames,
+                        )
+    return import_geotiffs(
+            scene=landsat_scene,
+            band_filenames=band_filenames,
+            source=source,
+            **import_options,
+    )
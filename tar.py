@@ -1,29 +1,294 @@
 import os
+import copy
+import json
+import shutil
 import tarfile
+import subprocess
+from contextlib import contextmanager
 from grass.pygrass.modules.shortcuts import general as g
+from constants import MTL_STRING
+from constants import TAR_EXTENSIONS
+from constants import GZIP_EXTENSIONS
+from constants import GZIP_DECOMPRESSORS
+from constants import TAR_INDEX_EXTENSION
+from metadata import parse_mtl
 
+VSITAR = '/vsitar/'
+CHUNK_SIZE = 16 * 1024 ** 2
+
+
+def is_tar(landsat_scene):
+    """
+    Check if a Landsat scene is delivered as a (compressed) tar file
+    """
+    return any(landsat_scene.endswith(extension) for extension in TAR_EXTENSIONS)
+
+def is_gzip(tgz):
+    """
+    Check if a tar file is gzip compressed
+    """
+    return any(tgz.endswith(extension) for extension in GZIP_EXTENSIONS)
+
+def find_gzip_decompressor():
+    """
+    Return the command line of the first available external, faster than
+    Python's own, gzip decompressor or None if there is none
+    """
+    for decompressor, command in GZIP_DECOMPRESSORS.items():
+        if shutil.which(decompressor):
+            return command
+
+@contextmanager
+def open_tar(tgz):
+    """
+    Open a tar, or a gzip compressed tar, file for reading
+
+    A gzip compressed file is piped through an external parallel gzip
+    decompressor, such as pigz or igzip, if one is available. The archive is
+    then read as a stream: members must be accessed in the order they are
+    stored. Otherwise, and for uncompressed tar files, Python's tarfile
+    module is used.
+    """
+    command = None
+    if is_gzip(tgz):
+        command = find_gzip_decompressor()
+
+    if command:
+        process = subprocess.Popen(command + [tgz], stdout=subprocess.PIPE)
+        tar = tarfile.open(fileobj=process.stdout, mode='r|')
+        try:
+            yield tar
+        finally:
+            tar.close()
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+    else:
+        with tarfile.open(name=tgz, mode='r') as tar:
+            yield tar
+
+
+def get_tar_status(tgz):
+    """
+    Return the size and the modification time of a tar file, which an index
+    of its members is valid for
+    """
+    status = os.stat(tgz)
+    return {'size': status.st_size, 'mtime': status.st_mtime}
+
+def describe_tar_member(tar_info):
+    """
+    Return the index entry of a member of a tar file, see read_tar_index()
+    """
+    return {
+            'name': tar_info.name,
+            'offset_data': tar_info.offset_data,
+            'size': tar_info.size,
+    }
+
+def load_tar_index(tgz):
+    """
+    Return the index of the regular files inside a tar file from its
+    sidecar file, or None if it is missing or outdated, see read_tar_index()
+    """
+    try:
+        with open(tgz + TAR_INDEX_EXTENSION) as index_file:
+            index = json.load(index_file)
+        if index['archive'] == get_tar_status(tgz):
+            return index['members']
+
+    except (OSError, ValueError, KeyError):
+        pass
+
+def write_tar_index(tgz, tar_infos):
+    """
+    Write the index of the regular files inside a tar file, given the
+    TarInfo records of all of its members, if the directory is writable
+
+    Returns
+    -------
+    members :
+        The index, see read_tar_index()
+    """
+    members = [
+            describe_tar_member(tar_info)
+            for tar_info in tar_infos
+            if tar_info.isfile()
+    ]
+    try:
+        with open(tgz + TAR_INDEX_EXTENSION, 'w') as index_file:
+            json.dump({'archive': get_tar_status(tgz), 'members': members}, index_file)
+
+    except OSError:
+        pass
+
+    return members
+
+def read_tar_index(tgz):
+    """
+    Return the index of the regular files inside a tar file
+
+    The index is kept in a sidecar JSON file next to the tar file and lists
+    the name, the offset of the data and the size of each member. It is
+    valid as long as the size and the modification time of the tar file are
+    unchanged. Otherwise, or if missing, the tar file is scanned once and
+    the index is (re-)written, if the directory is writable. Functions that
+    decompress a tar file anyway, see extract_tgz() and read_mtl_from_tar(),
+    write the index as a by-product instead.
+
+    Returns
+    -------
+    members :
+        List of dictionaries with the keys 'name', 'offset_data' and 'size'
+    """
+    members = load_tar_index(tgz)
+    if members is not None:
+        return members
+
+    with open_tar(tgz) as tar:
+        return write_tar_index(tgz, tar)
 
 def list_files_in_tar(tgz):
     """List files in tar.gz file"""
     compressed_scene = os.path.basename(tgz)
     g.message(_(f'Reading compressed scene \'{compressed_scene}\'...'))
-    tar = tarfile.TarFile.open(name=tgz, mode='r')
-    members = tar.getnames()
+    members = [member['name'] for member in read_tar_index(tgz)]
     members = """
     {}
-    """.format('\n'.join(members[1:]))
+    """.format('\n'.join(members))
     index_of_dot = compressed_scene.index('.')
     scene = compressed_scene[:index_of_dot]
     message = f'List of files in {scene}'
     message += members
     g.message(message)
 
-def extract_tgz(tgz):
+def list_tar_members(tgz):
+    """
+    Return the names of the regular files inside a tar.gz file
+    """
+    return [member['name'] for member in read_tar_index(tgz)]
+
+def is_mtl_member(member):
+    """
+    Check if a member of a tar.gz file is an *MTL.txt metadata file
+    """
+    return os.path.basename(member).endswith(MTL_STRING + '.txt')
+
+def find_mtl_member(members):
+    """
+    Return the name of the *MTL.txt metadata file among the members of a
+    tar.gz file, or None if there is none
+    """
+    for member in members:
+        if is_mtl_member(member):
+            return member
+
+def read_mtl_from_tar(tgz, build_index=False):
+    """
+    Parse the *MTL.txt metadata file of a tar file without extracting it
+
+    The MTL member of an uncompressed tar file is read directly at its
+    offset. A compressed tar file is decompressed up to the MTL member or,
+    if it has no index yet and 'build_index' is True, to its end, so that
+    the index is written in the same pass, see read_tar_index().
+
+    Returns
+    -------
+    mtl :
+        The parsed MTL metadata (see parse_mtl()) or None if there is no MTL
+        file in the tar file
+    """
+    index = load_tar_index(tgz)
+    if index is None and not is_gzip(tgz):
+        index = read_tar_index(tgz)  # headers only, no data is read
+
+    data = None
+    if index is None:
+        with open_tar(tgz) as tar:
+            for tar_info in tar:
+                if data is None and tar_info.isfile() and is_mtl_member(tar_info.name):
+                    data = tar.extractfile(tar_info).read()
+                    if not build_index:
+                        break
+            else:
+                write_tar_index(tgz, tar.getmembers())
+
+    else:
+        mtl_member = find_mtl_member([member['name'] for member in index])
+        if not mtl_member:
+            return None
+
+        if not is_gzip(tgz):
+            member = next(member for member in index if member['name'] == mtl_member)
+            with open(tgz, 'rb') as archive:
+                archive.seek(member['offset_data'])
+                data = archive.read(member['size'])
+
+        else:
+            with open_tar(tgz) as tar:
+                for tar_info in tar:
+                    if tar_info.name == mtl_member:
+                        data = tar.extractfile(tar_info).read()
+                        break
+
+    if data is None:
+        return None
+    return parse_mtl(data.decode().splitlines())
+
+def get_scene_directory(tgz):
+    """
+    Return the name of the directory a tar.gz file is unpacked into
+    """
+    tgz_base = os.path.basename(tgz)
+    for extension in TAR_EXTENSIONS:
+        if tgz_base.endswith(extension):
+            return tgz_base[:-len(extension)]
+    return tgz_base
+
+def get_vsitar_path(tgz, members):
+    """
+    Return a GDAL /vsitar/ path to the directory, inside a tar.gz file, that
+    holds the given members.  Band files may then be read directly from the
+    archive, without extracting them.
+    """
+    path = VSITAR + os.path.abspath(tgz)
+    directory = os.path.normpath(os.path.dirname(members[0])) if members else '.'
+    if directory != '.':
+        path = '/'.join([path, directory])
+    return path
+
+def extract_tgz(tgz, select=None):
     """
     Decompress and unpack a .tgz file
+
+    Selection is made against the index of the tar file (see
+    read_tar_index()). Selected members of an uncompressed tar file are
+    read directly at their offsets. A compressed tar file is read in a
+    single pass, up to the last selected member: members that are not
+    selected are decompressed in memory but never written to disk. A
+    compressed tar file without an index is read to its end, selecting
+    members as they stream by, and its index is written in the same pass.
+
+    Parameters
+    ----------
+    tgz :
+        Compressed tar.gz file
+
+    select :
+        Function that accepts a member name and returns True if the member
+        is to be extracted. If None, all members are extracted. Selected
+        members are extracted flat inside the scene directory.
+
+    Returns
+    -------
+    tgz_base :
+        Directory inside which files are extracted
+
+    members :
+        Names of all regular files inside the tar.gz file
     """
-    tar = tarfile.TarFile.open(name=tgz, mode='r')
-    tgz_base = os.path.basename(tgz).split('.tar.gz')[0]
+    tgz_base = get_scene_directory(tgz)
 
     # try to create a directory with the scene's (base)name
     # source: <http://stackoverflow.com/a/14364249/1172302>
@@ -36,5 +301,64 @@ def extract_tgz(tgz):
 
     # extract files indide the scene directory
     compressed_scene = os.path.basename(tgz)
-    g.message(_(f'Extracting files from compressed_scene {compressed_scene}'))
-    tar.extractall(path=tgz_base)
+    index = load_tar_index(tgz)
+    if index is None and not is_gzip(tgz):
+        index = read_tar_index(tgz)  # headers only, no data is read
+
+    if select is None:
+        g.message(_(f'Extracting files from compressed_scene {compressed_scene}'))
+        with open_tar(tgz) as tar:
+            tar.extractall(path=tgz_base)
+            if index is None:
+                index = write_tar_index(tgz, tar.getmembers())
+        return tgz_base, [member['name'] for member in index]
+
+    message = 'Extracting selected files from compressed scene'
+    message += f' {compressed_scene}'
+    g.message(_(message))
+
+    # compressed tar files without an index: match members as they stream
+    # by, and write the index at the end of this single pass
+    if index is None:
+        with open_tar(tgz) as tar:
+            for tar_info in tar:
+                if not tar_info.isfile() or not select(tar_info.name):
+                    continue
+                extracted = copy.copy(tar_info)
+                extracted.name = os.path.basename(tar_info.name)
+                tar.extract(extracted, path=tgz_base)
+            index = write_tar_index(tgz, tar.getmembers())
+        return tgz_base, [member['name'] for member in index]
+
+    members = [member['name'] for member in index]
+    selected = [member for member in index if select(member['name'])]
+
+    # uncompressed tar files: copy the data of selected members directly
+    if not is_gzip(tgz):
+        with open(tgz, 'rb') as archive:
+            for member in selected:
+                filename = os.path.join(tgz_base, os.path.basename(member['name']))
+                archive.seek(member['offset_data'])
+                with open(filename, 'wb') as extracted:
+                    remaining = member['size']
+                    while remaining > 0:
+                        chunk = archive.read(min(remaining, CHUNK_SIZE))
+                        if not chunk:
+                            break
+                        extracted.write(chunk)
+                        remaining -= len(chunk)
+        return tgz_base, members
+
+    # compressed tar files: stop decompressing after the last selected member
+    remaining = set(member['name'] for member in selected)
+    with open_tar(tgz) as tar:
+        for tar_info in tar:
+            if not remaining:
+                break
+            if tar_info.name not in remaining:
+                continue
+            remaining.discard(tar_info.name)
+            tar_info = copy.copy(tar_info)
+            tar_info.name = os.path.basename(tar_info.name)
+            tar.extract(tar_info, path=tgz_base)
+    return tgz_base, members
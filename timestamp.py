@@ -4,10 +4,19 @@ from constants import TIME_STRINGS
 from constants import ZERO_TIMEZONE
 from constants import GRASS_VERBOSITY_LELVEL_3
 import os
+import glob
 import grass.script as grass
-from metadata import get_metafile
+from metadata import read_mtl
+from metadata import find_mtl_value
+from identify import parse_product_identifier
+from tar import get_scene_directory
+from tar import is_tar
+from tar import read_mtl_from_tar
+from metadata import get_path_to_cell_misc
 from datetime import datetime
 
+TIMESTAMP = 'timestamp'
+
 
 def validate_date_string(date_string):
     """
@@ -47,68 +56,124 @@ def get_timestamp(scene, skip_microseconds=False):
     Input:  Metadata *MTL.txt file
     Output: Return date, time and timezone of acquisition
     """
-    metafile = get_metafile(scene)
+    return get_timestamp_from_mtl(read_mtl(scene), skip_microseconds)
+
+def get_timestamp_from_mtl(mtl, skip_microseconds=False):
+    """
+    Scope:  Retrieve timestamp of a Landsat scene
+    Input:  Parsed MTL metadata, see parse_mtl()
+    Output: Return date, time and timezone of acquisition
+    """
     date_time = dict()
 
-    try:
-        metadata = open(metafile)
+    # get Date
+    date = find_mtl_value(mtl, DATE_STRINGS)
+    if date is not None:
+        date_time['date'] = date
+        validate_date_string(date_time['date'])
 
-        for line in metadata.readlines():
-            line = line.rstrip('\n')
+    # get Time
+    time = find_mtl_value(mtl, TIME_STRINGS)
+    if time is not None:
 
-            if len(line) == 0:
-                continue
+        # first, zero timezone if 'Z' is the last character
+        if time.endswith('Z'):
+            date_time['timezone'] = ZERO_TIMEZONE
 
-            # get Date
-            if any(x in line for x in DATE_STRINGS):
-                date_time['date'] = line.strip().split('=')[1].strip()
-                validate_date_string(date_time['date'])
+        # remove 'Z'
+        translation_table = str.maketrans('', '', 'Z')
+        time = time.translate(translation_table)
 
-            # get Time
-            if any(x in line for x in TIME_STRINGS):
+        # split string, convert to int later -- This Is Not Right
+        hours, minutes, seconds = time.split('.')[0].split(':')
 
-                # remove " from detected line
-                if('\"' in line):
-                    line = line.replace('\"', '')
+        if not skip_microseconds:
+            # round microseconds to six digits!
+            microseconds = float(time.split('.')[1])
+            microseconds = round((microseconds / 10000000), 6)
 
-                # first, zero timezone if 'Z' is the last character
-                if line.endswith('Z'):
-                    date_time['timezone'] = ZERO_TIMEZONE
+            # add to seconds
+            seconds = int(seconds)
+            seconds += microseconds
+            seconds = format(seconds, '.6f')
+            seconds = add_leading_zeroes(seconds, 2)
 
-                # remove 'Z' and split the string before & after '='
-                translation_table = str.maketrans('', '', 'Z')
-                time = line.strip().split('=')[1].strip().translate(translation_table)
+        if float(seconds) < 10:
+            seconds = seconds.split('.')[0]
 
-                # split string, convert to int later -- This Is Not Right
-                hours, minutes, seconds = time.split('.')[0].split(':')
+        time = ':'.join([hours, minutes, str(seconds)])
+        validate_time_string(time)
+        time = time.split(':')
 
-                if not skip_microseconds:
-                    # round microseconds to six digits!
-                    microseconds = float(time.split('.')[1])
-                    microseconds = round((microseconds / 10000000), 6)
+        # create hours, minutes, seconds in date_time dictionary
+        date_time['hours'] = format(int(hours), '02d')
+        date_time['minutes'] = format(int(minutes), '02d')
+        date_time['seconds'] = seconds # float?
 
-                    # add to seconds
-                    seconds = int(seconds)
-                    seconds += microseconds
-                    seconds = format(seconds, '.6f')
-                    seconds = add_leading_zeroes(seconds, 2)
+    return date_time
 
-                if float(seconds) < 10:
-                    seconds = seconds.split('.')[0]
+def get_timestamp_from_identifier(scene):
+    """
+    Scope:  Retrieve the date of acquisition of a Landsat scene without any
+            I/O, from the product identifier in its directory or file name
+    Input:  Landsat scene directory or (compressed) tar file
+    Output: Return the date of acquisition only
+    """
+    product_identifier = parse_product_identifier(get_scene_directory(scene))
+    if not product_identifier:
+        message = f'Unable to read the date of acquisition from {scene}!'
+        grass.fatal(_(message))
 
-                time = ':'.join([hours, minutes, str(seconds)])
-                validate_time_string(time)
-                time = time.split(':')
+    return {'date': product_identifier.acquisition_date.isoformat()}
 
-                # create hours, minutes, seconds in date_time dictionary
-                date_time['hours'] = format(int(hours), '02d')
-                date_time['minutes'] = format(int(minutes), '02d')
-                date_time['seconds'] = seconds # float?
+def retrieve_timestamp(scene, metadata_source='mtl', skip_microseconds=False):
+    """
+    Retrieve the timestamp of a Landsat scene from the requested source
 
-    finally:
-        metadata.close()
+    Parameters
+    ----------
+    scene :
+        Landsat scene directory or (compressed) tar file
 
-    return date_time
+    metadata_source :
+        'mtl' reads date, time and timezone from the MTL metadata file, of
+        a tar file without extracting it, see read_mtl_from_tar().
+        'filename' reads the date only from the product identifier.
+        'auto' reads the MTL metadata file if the scene is a directory that
+        contains one, else the product identifier.
+
+    Returns
+    -------
+    date_time :
+        Dictionary of date and, unless read from the product identifier,
+        hours, minutes, seconds and timezone
+    """
+    if metadata_source == 'auto':
+        if os.path.isdir(scene) and glob.glob(scene + '/*MTL.txt'):
+            metadata_source = 'mtl'
+        else:
+            metadata_source = 'filename'
+
+    if metadata_source == 'filename':
+        return get_timestamp_from_identifier(scene)
+
+    if is_tar(scene):
+        mtl = read_mtl_from_tar(scene)
+        if not mtl:
+            message = "Missing 'MTL' metadata file!"
+            message += f' Skipping import process for scene {scene}.'
+            grass.fatal(message)
+        return get_timestamp_from_mtl(mtl, skip_microseconds)
+
+    return get_timestamp(scene, skip_microseconds=skip_microseconds)
+
+def needs_mtl(scene, metadata_source):
+    """
+    Check if retrieving the timestamp of a scene requires its MTL file
+    """
+    if metadata_source == 'auto':
+        return os.path.isdir(scene)
+    return metadata_source == 'mtl'
 
 def build_tgis_timestamp(
         prefix,
@@ -140,6 +205,11 @@ def build_tgis_timestamp(
     date_Ymd = datetime.strptime(date, "%Y-%m-%d")
     date_tgis = datetime.strftime(date_Ymd, "%d %b %Y")
 
+    # date only, i.e. read from the product identifier
+    if 'hours' not in timestamp:
+        os.environ['GRASS_VERBOSE'] = GRASS_VERBOSITY_LELVEL_3
+        return f'{prefix}{scene}|{date_tgis}'
+
     hours = str(timestamp['hours'])
     minutes = str(timestamp['minutes'])
     seconds = str(timestamp['seconds'])
@@ -172,6 +242,10 @@ def simple_timestamp(timestamp):
     date_Ymd = datetime.strptime(date, "%Y-%m-%d")
     date_tgis = datetime.strftime(date_Ymd, "%d %b %Y")
 
+    # date only, i.e. read from the product identifier
+    if 'hours' not in timestamp:
+        return date
+
     hours = str(timestamp['hours'])
     minutes = str(timestamp['minutes'])
     seconds = str(timestamp['seconds'])
@@ -198,6 +272,9 @@ def build_r_timestamp(timestamp):
         # else, if not ('-' in timestamp['date']): what?
         month = MONTHS[month]
         day_month_year = ' '.join((day, month, year))
+        # date only, i.e. read from the product identifier
+        if 'hours' not in timestamp:
+            return day_month_year
         # hours, minutes, seconds
         hours = str(timestamp['hours'])
         minutes = str(timestamp['minutes'])
@@ -207,10 +284,19 @@ def build_r_timestamp(timestamp):
         timestamp = ' '.join((day_month_year, hours_minutes_seconds))
     return timestamp
 
-def set_timestamp(band, timestamp):
+def set_timestamps(bands, timestamp, mapset):
     """
-    Builds and sets the timestamp (as a string!) for a raster map
+    Builds and sets the timestamp (as a string!) for multiple raster maps in
+    one pass
+
+    Instead of running 'r.timestamp' for each band, the timestamp file of
+    each raster map, i.e. 'cell_misc/<band>/timestamp' inside the requested
+    Mapset, is written directly, in the format 'r.timestamp' reads
     """
     timestamp = build_r_timestamp(timestamp)
-    # stamp bands
-    grass.run_command('r.timestamp', map=band, date=timestamp, verbose=True)
+    path_to_cell_misc = get_path_to_cell_misc(mapset)
+    for band in bands:
+        path_to_band_misc = '/'.join([path_to_cell_misc, band])
+        os.makedirs(path_to_band_misc, exist_ok=True)
+        with open('/'.join([path_to_band_misc, TIMESTAMP]), 'w') as timestamp_file:
+            timestamp_file.write(timestamp + '\n')
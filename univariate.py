@@ -0,0 +1,128 @@
+import os
+import json
+import math
+from metadata import get_path_to_cell_misc
+
+# NumPy is required by the in-process import engines only, see native.py
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+STATISTICS_FILENAME = 'statistics.json'
+SCENE_STATISTICS_SUFFIX = '_statistics.json'
+
+
+def start_statistics():
+    """
+    Return empty univariate statistics, to be fed with blocks of a raster map
+    as they are written, see add_statistics()
+    """
+    return dict(
+            count=0,
+            mean=0.0,
+            m2=0.0,
+            minimum=None,
+            maximum=None,
+            histogram=None,
+    )
+
+def add_statistics(statistics, block, valid):
+    """
+    Update univariate statistics with the valid cells of a block of rows
+
+    The mean and the sum of squared deviations of the block are merged with
+    the ones accumulated so far, which is numerically stable for any number
+    of cells.  For integer cells, a histogram of all values is accumulated
+    via numpy.bincount().
+    """
+    values = block[valid]
+    if not values.size:
+        return
+
+    count = values.size
+    mean = float(values.mean(dtype=numpy.float64))
+    m2 = float(numpy.square(values - mean, dtype=numpy.float64).sum())
+    total = statistics['count'] + count
+    delta = mean - statistics['mean']
+    statistics['m2'] += m2 + delta ** 2 * statistics['count'] * count / total
+    statistics['mean'] += delta * count / total
+    statistics['count'] = total
+
+    minimum = values.min().item()
+    maximum = values.max().item()
+    if statistics['minimum'] is None or minimum < statistics['minimum']:
+        statistics['minimum'] = minimum
+    if statistics['maximum'] is None or maximum > statistics['maximum']:
+        statistics['maximum'] = maximum
+
+    # histograms of non-negative integers only, False once ruled out
+    histogram = statistics['histogram']
+    if histogram is False:
+        return
+
+    if not numpy.issubdtype(values.dtype, numpy.integer) or minimum < 0:
+        statistics['histogram'] = False
+        return
+
+    counts = numpy.bincount(values)
+    if histogram is None:
+        histogram = numpy.zeros(0, dtype=numpy.int64)
+    if len(counts) > len(histogram):
+        histogram = numpy.pad(histogram, (0, len(counts) - len(histogram)))
+    histogram[:len(counts)] += counts
+    statistics['histogram'] = histogram
+
+def finish_statistics(statistics):
+    """
+    Return the minimum, maximum, mean, standard deviation and number of
+    valid cells, and, for integer cells, the histogram as [value, count]
+    pairs of the values present
+    """
+    count = statistics['count']
+    summary = dict(
+            count=count,
+            minimum=statistics['minimum'],
+            maximum=statistics['maximum'],
+            mean=statistics['mean'] if count else None,
+            stddev=math.sqrt(statistics['m2'] / count) if count else None,
+    )
+    histogram = statistics['histogram']
+    if isinstance(histogram, numpy.ndarray):
+        values = numpy.flatnonzero(histogram)
+        summary['histogram'] = [
+                [int(value), int(histogram[value])] for value in values
+        ]
+    return summary
+
+def write_statistics(name, mapset, summary):
+    """
+    Write the statistics of a raster map in a JSON file inside its
+    'cell_misc' directory
+    """
+    path_to_band_misc = '/'.join([get_path_to_cell_misc(mapset), name])
+    os.makedirs(path_to_band_misc, exist_ok=True)
+    filename = '/'.join([path_to_band_misc, STATISTICS_FILENAME])
+    with open(filename, 'w') as statistics_file:
+        json.dump(summary, statistics_file)
+
+def write_scene_statistics(scene, mapset, summaries):
+    """
+    Write the statistics of all bands of a scene, without histograms, in a
+    JSON file inside the Mapset's 'cell_misc' directory, next to the MTL
+    file, and return its path
+    """
+    path_to_cell_misc = get_path_to_cell_misc(mapset)
+    os.makedirs(path_to_cell_misc, exist_ok=True)
+    filename = '/'.join([path_to_cell_misc, scene + SCENE_STATISTICS_SUFFIX])
+    scene_summary = {
+            name: {
+                key: value for key, value in summary.items()
+                if key != 'histogram'
+            }
+            for name, summary in summaries.items()
+    }
+    with open(filename, 'w') as statistics_file:
+        json.dump(scene_summary, statistics_file, indent=2)
+    return filename